@@ -0,0 +1,346 @@
+"""
+性能基准测试
+
+用法:
+    python benchmark.py keywords [--keywords 300] [--posts 2000] [--length 3000]
+    python benchmark.py db [--posts 2000] [--batch 20]
+    python benchmark.py fts [--rows 500000] [--queries 20]
+    python benchmark.py notify [--messages 500] [--handshake-delay 0.03] [--fail-every 0]
+    python benchmark.py decode [--posts 1000] [--rounds 20]
+"""
+import os
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from db_handler import DBHandler
+from keyword_matcher import KeywordMatcher
+import post_record
+
+# 生成测试文本用的常见汉字
+CHARSET = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+
+# 当前实现（逐个关键词 in 判断）
+def keywords_loop(keywords, subject, content):
+    return [keyword for keyword in keywords if keyword in subject or keyword in content]
+
+
+def random_text(rng, length):
+    return ''.join(rng.choice(CHARSET) for _ in range(length))
+
+
+def bench_keywords(args):
+    """对比逐个关键词循环与 Aho–Corasick 匹配器"""
+    rng = random.Random(args.seed)
+    keywords = list(dict.fromkeys(random_text(rng, rng.randint(2, 4)) for _ in range(args.keywords)))
+    posts = [(random_text(rng, 20), random_text(rng, args.length)) for _ in range(args.posts)]
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    build_time = time.perf_counter() - start
+
+    # 旧流程中 get_posts 和 main 各扫描一次
+    start = time.perf_counter()
+    loop_hits = 0
+    for subject, content in posts:
+        matched = keywords_loop(keywords, subject, content)
+        if matched:
+            loop_hits += len(keywords_loop(keywords, subject, content))
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher_hits = 0
+    for subject, content in posts:
+        matcher_hits += len(matcher.match(subject, content))
+    matcher_time = time.perf_counter() - start
+
+    assert loop_hits == matcher_hits, f"匹配结果不一致: {loop_hits} != {matcher_hits}"
+    print(f"关键词 {len(keywords)} 个，帖子 {len(posts)} 个，正文长度 {args.length}")
+    print(f"逐个关键词循环: {loop_time:.3f}秒 ({len(posts) / loop_time:.0f} 帖/秒)")
+    print(f"Aho–Corasick:   {matcher_time:.3f}秒 ({len(posts) / matcher_time:.0f} 帖/秒)，构建耗时 {build_time * 1000:.1f}毫秒")
+    print(f"加速比: {loop_time / matcher_time:.1f}x")
+
+
+def random_post_data(rng, index, keywords):
+    return {
+        'post_id': str(10000000 + index),
+        'forum_id': '候车室',
+        'title': random_text(rng, 20),
+        'content': random_text(rng, 500),
+        'keywords': '、'.join(rng.sample(keywords, rng.randint(1, 3))),
+        'url': f"https://www.miyoushe.com/sr/article/{10000000 + index}",
+        'author': random_text(rng, 6),
+        'author_id': str(rng.randint(1, 10 ** 9)),
+        'created_at': 1700000000 + index,
+        'updated_at': 1700000000 + index,
+        'view_count': rng.randint(0, 1000),
+        'reply_count': rng.randint(0, 100),
+        'like_count': rng.randint(0, 100),
+    }
+
+
+# 旧流程：每个帖子先查存在性，再单独写入并提交
+def legacy_save_post(conn, post_data):
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM posts WHERE post_id = ?', (post_data['post_id'],))
+    cursor.fetchone()
+    cursor.execute('''
+    INSERT OR REPLACE INTO posts
+    (post_id, forum_id, title, content, keywords, url, timestamp,
+     author, author_id, created_at, updated_at, view_count, reply_count, like_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        post_data['post_id'], post_data['forum_id'], post_data['title'], post_data['content'],
+        post_data['keywords'], post_data['url'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        post_data['author'], post_data['author_id'], post_data['created_at'], post_data['updated_at'],
+        post_data['view_count'], post_data['reply_count'], post_data['like_count']
+    ))
+    for keyword in post_data['keywords'].split('、'):
+        cursor.execute('INSERT OR IGNORE INTO keywords (keyword) VALUES (?)', (keyword,))
+        cursor.execute('UPDATE keywords SET count = count + 1 WHERE keyword = ?', (keyword,))
+    conn.commit()
+
+
+def bench_db(args):
+    """对比逐条提交与批量事务写入"""
+    rng = random.Random(args.seed)
+    keywords = [random_text(rng, 2) for _ in range(50)]
+    posts = [random_post_data(rng, i, keywords) for i in range(args.posts)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_path = os.path.join(tmp_dir, 'legacy.db')
+        DBHandler(legacy_path).close()
+        conn = sqlite3.connect(legacy_path)
+        start = time.perf_counter()
+        for post_data in posts:
+            legacy_save_post(conn, post_data)
+        legacy_time = time.perf_counter() - start
+        conn.close()
+
+        db = DBHandler(os.path.join(tmp_dir, 'bulk.db'))
+        start = time.perf_counter()
+        for offset in range(0, len(posts), args.batch):
+            batch = posts[offset:offset + args.batch]
+            db.existing_post_ids([post_data['post_id'] for post_data in batch])
+            db.save_posts_bulk(batch)
+        bulk_time = time.perf_counter() - start
+        db.close()
+
+    print(f"帖子 {len(posts)} 个，每批 {args.batch} 个")
+    print(f"逐条提交: {legacy_time:.3f}秒 ({len(posts) / legacy_time:.0f} 帖/秒)")
+    print(f"批量事务: {bulk_time:.3f}秒 ({len(posts) / bulk_time:.0f} 帖/秒)")
+    print(f"加速比: {legacy_time / bulk_time:.1f}x")
+
+
+def bench_fts(args):
+    """在合成数据库上对比 LIKE 与 FTS5 全文检索"""
+    rng = random.Random(args.seed)
+    # 先生成一段长文本，再随机截取片段作为标题和正文，加快造数
+    corpus = random_text(rng, 1000000)
+
+    def snippet(length):
+        offset = rng.randrange(len(corpus) - length)
+        return corpus[offset:offset + length]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DBHandler(os.path.join(tmp_dir, 'fts.db'))
+        if not db.fts_enabled:
+            print("当前SQLite不支持FTS5 trigram分词，无法进行对比")
+            return
+
+        start = time.perf_counter()
+        batch = []
+        for i in range(args.rows):
+            batch.append({
+                'post_id': str(i), 'forum_id': '候车室', 'title': snippet(20),
+                'content': snippet(args.length), 'keywords': '', 'url': '',
+            })
+            if len(batch) >= 5000:
+                db.save_posts_bulk(batch)
+                batch = []
+        db.save_posts_bulk(batch)
+        print(f"生成 {args.rows} 条帖子（含全文索引）耗时 {time.perf_counter() - start:.1f}秒")
+
+        queries = [snippet(rng.randint(3, 5)) for _ in range(args.queries)]
+        timings = {}
+        for name, fts_enabled in (('LIKE', False), ('FTS5', True)):
+            db.fts_enabled = fts_enabled
+            start = time.perf_counter()
+            total = sum(len(db.get_posts({'search_text': query})) for query in queries)
+            timings[name] = (time.perf_counter() - start) / len(queries)
+            print(f"{name}: 平均每次查询 {timings[name] * 1000:.1f}毫秒，共命中 {total} 条")
+        db.close()
+
+    print(f"加速比: {timings['LIKE'] / timings['FTS5']:.1f}x")
+
+
+def bench_notify(args):
+    """使用本地桩服务对比每次新建连接与共享连接池的发送速率"""
+    import requests
+    from notifier_transport import NotifierTransport, check_response
+    from stub_webhook import start_stub_webhook
+
+    server, url = start_stub_webhook(delay=args.delay, handshake_delay=args.handshake_delay,
+                                     fail_every=args.fail_every)
+    message = {"msgtype": "text", "text": {"content": "基准测试消息"}}
+
+    # 旧实现：每条消息调用模块级 requests.post，每次都新建 TCP 连接
+    start = time.perf_counter()
+    legacy_failed = 0
+    for _ in range(args.messages):
+        response = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(message), timeout=10)
+        legacy_failed += not check_response(response)[0]
+    legacy_time = time.perf_counter() - start
+
+    transport = NotifierTransport()
+    start = time.perf_counter()
+    pooled_failed = 0
+    for _ in range(args.messages):
+        pooled_failed += not check_response(transport.post_json(url, message))[0]
+    pooled_time = time.perf_counter() - start
+    transport.close()
+    server.shutdown()
+
+    print(f"消息 {args.messages} 条，桩服务处理耗时 {args.delay * 1000:.0f}毫秒/条，"
+          f"建立连接耗时 {args.handshake_delay * 1000:.0f}毫秒/次")
+    print(f"每次新建连接: {legacy_time:.3f}秒 ({args.messages / legacy_time:.0f} 条/秒)，被限流 {legacy_failed} 条")
+    print(f"共享连接池:   {pooled_time:.3f}秒 ({args.messages / pooled_time:.0f} 条/秒)，被限流 {pooled_failed} 条")
+    print(f"加速比: {legacy_time / pooled_time:.1f}x")
+
+
+def random_api_item(rng, index):
+    """生成接近真实接口的帖子列表项，包含监控用不到的图片、话题等字段"""
+    post_id = str(50000000 + index)
+    return {
+        'post': {
+            'game_id': 6, 'post_id': post_id, 'f_forum_id': 52, 'uid': str(rng.randint(1, 10 ** 9)),
+            'subject': random_text(rng, 20), 'content': random_text(rng, 300),
+            'cover': f"https://upload-bbs.miyoushe.com/upload/{post_id}.png",
+            'view_type': 1, 'created_at': 1700000000 + index, 'updated_at': 1700000000 + index,
+            'images': [f"https://upload-bbs.miyoushe.com/upload/{post_id}_{i}.png" for i in range(3)],
+            'post_status': {'is_top': False, 'is_good': False, 'is_official': False},
+            'topic_ids': [rng.randint(1, 500) for _ in range(3)], 'view_status': 1, 'max_floor': rng.randint(1, 500),
+            'is_original': 0, 'republish_authorization': 0, 'reply_time': '2024-01-01 12:00:00',
+            'is_deleted': 0, 'is_interactive': False, 'structured_content': random_text(rng, 600),
+            'structured_content_rows': [], 'review_id': 0, 'is_profit': False, 'is_in_profit': False,
+        },
+        'forum': {'id': 52, 'name': '候车室', 'icon': 'https://upload-bbs.miyoushe.com/forum.png', 'game_id': 6},
+        'topics': [{'id': rng.randint(1, 500), 'name': random_text(rng, 4), 'cover': '', 'is_top': False}
+                   for _ in range(3)],
+        'user': {
+            'uid': str(rng.randint(1, 10 ** 9)), 'nickname': random_text(rng, 6), 'introduce': random_text(rng, 30),
+            'avatar': '10001', 'gender': 0, 'certification': {'type': 0, 'label': ''},
+            'level_exp': {'level': 5, 'exp': 1000}, 'avatar_url': 'https://img-static.mihoyo.com/avatar.png',
+        },
+        'self_operation': {'attitude': 0, 'is_collected': False},
+        'stat': {'view_num': rng.randint(0, 10000), 'reply_num': rng.randint(0, 100),
+                 'like_num': rng.randint(0, 100), 'bookmark_num': 0, 'forward_num': 0},
+        'help_sys': None, 'cover': None,
+        'image_list': [{'url': f"https://upload-bbs.miyoushe.com/upload/{post_id}_{i}.png", 'height': 1080,
+                        'width': 1920, 'format': 'png', 'size': '123456'} for i in range(3)],
+    }
+
+
+def measure_decode(decode, bodies):
+    """返回 (每轮耗时秒数, 保留结果的内存字节数, 解码峰值内存字节数)"""
+    start = time.perf_counter()
+    for body in bodies:
+        decode(body)
+    elapsed = (time.perf_counter() - start) / len(bodies)
+
+    tracemalloc.start()
+    result = decode(bodies[0])
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained, peak
+
+
+def bench_decode(args):
+    """对比完整解析响应与投影为精简记录的CPU和内存开销"""
+    rng = random.Random(args.seed)
+    body = json.dumps({'retcode': 0, 'message': 'OK', 'data': {
+        'list': [random_api_item(rng, i) for i in range(args.posts)], 'last_id': '1', 'is_last': False,
+    }}, ensure_ascii=False).encode('utf-8')
+    bodies = [body] * args.rounds
+    debug_disabled = not logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    # 旧实现：response.json() 保留完整字典，并且无论是否开启DEBUG都格式化整个响应
+    def legacy(content):
+        post_data = json.loads(content)
+        f"API响应内容: {post_data}"
+        return post_data["data"]["list"]
+
+    def projected_json(content):
+        orjson, post_record.orjson = post_record.orjson, None
+        try:
+            return post_record.decode_post_list(content)
+        finally:
+            post_record.orjson = orjson
+
+    candidates = [('完整解析', legacy), ('投影(json)', projected_json)]
+    if post_record.orjson is not None:
+        candidates.append(('投影(orjson)', post_record.decode_post_list))
+    else:
+        print("未安装 orjson，跳过 orjson 解码器")
+
+    print(f"每页 {args.posts} 个帖子，响应体 {len(body) / 1024:.0f}KB，DEBUG日志{'关闭' if debug_disabled else '开启'}")
+    scale = 1000 / args.posts
+    baseline = None
+    for name, decode in candidates:
+        elapsed, retained, peak = measure_decode(decode, bodies)
+        baseline = baseline or elapsed
+        print(f"{name}: 每1000帖 CPU {elapsed * scale * 1000:.1f}毫秒，保留内存 {retained * scale / 1024:.0f}KB，"
+              f"解码峰值 {peak * scale / 1024:.0f}KB，加速比 {baseline / elapsed:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    keywords_parser = subparsers.add_parser('keywords', help="关键词匹配")
+    keywords_parser.add_argument('--keywords', type=int, default=300, help="关键词数量")
+    keywords_parser.add_argument('--posts', type=int, default=2000, help="帖子数量")
+    keywords_parser.add_argument('--length', type=int, default=3000, help="正文长度")
+    keywords_parser.set_defaults(func=bench_keywords)
+
+    db_parser = subparsers.add_parser('db', help="数据库写入")
+    db_parser.add_argument('--posts', type=int, default=2000, help="帖子数量")
+    db_parser.add_argument('--batch', type=int, default=20, help="每轮写入的帖子数")
+    db_parser.set_defaults(func=bench_db)
+
+    fts_parser = subparsers.add_parser('fts', help="全文检索")
+    fts_parser.add_argument('--rows', type=int, default=500000, help="合成帖子数量")
+    fts_parser.add_argument('--length', type=int, default=200, help="正文长度")
+    fts_parser.add_argument('--queries', type=int, default=20, help="查询次数")
+    fts_parser.set_defaults(func=bench_fts)
+
+    notify_parser = subparsers.add_parser('notify', help="通知发送")
+    notify_parser.add_argument('--messages', type=int, default=500, help="消息数量")
+    notify_parser.add_argument('--delay', type=float, default=0.0, help="桩服务每条消息的处理耗时（秒）")
+    notify_parser.add_argument('--handshake-delay', type=float, default=0.03,
+                               help="桩服务模拟的每次建立连接耗时（秒），用于近似 TLS 握手开销")
+    notify_parser.add_argument('--fail-every', type=int, default=0,
+                               help="桩服务每隔多少条消息返回一次限流错误（HTTP 200，errcode 130101）")
+    notify_parser.set_defaults(func=bench_notify)
+
+    decode_parser = subparsers.add_parser('decode', help="接口响应解码")
+    decode_parser.add_argument('--posts', type=int, default=1000, help="每页帖子数")
+    decode_parser.add_argument('--rounds', type=int, default=20, help="解码轮数")
+    decode_parser.set_defaults(func=bench_decode)
+
+    args = parser.parse_args()
+    # 屏蔽被测模块的逐条INFO日志，避免日志输出影响计时
+    logging.disable(logging.INFO)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器，根据真实请求的结果判断服务是否可用
+
+    连续失败达到阈值后打开，打开期间直接拒绝请求；冷却时间过后进入半开状态，
+    只放行一个探测请求，探测成功则关闭，失败则重新打开。
+    状态在调用之间保持，服务正常时不产生任何额外的连接。
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60.0, name="api"):
+        """
+        :param failure_threshold: 打开熔断器所需的连续失败次数
+        :param cooldown: 打开后到允许探测请求的等待时间（秒）
+        :param name: 熔断器名称，用于日志
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.name = name
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self._stats = {'success': 0, 'failure': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self):
+        """当前状态"""
+        with self._lock:
+            return self._state
+
+    def retry_after(self):
+        """距离允许探测请求还需等待的秒数，未打开时为0"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow_request(self):
+        """
+        判断是否放行一个请求，放行后调用方必须调用 record_success 或 record_failure
+        :return: 是否放行
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+                self._probe_started = None
+                logging.info(f"熔断器 {self.name} 冷却结束，发送探测请求")
+            if self._state == HALF_OPEN:
+                # 只放行一个探测请求；探测请求超过冷却时间仍无结果时允许重新探测
+                if self._probe_started is None or now - self._probe_started >= self.cooldown:
+                    self._probe_started = now
+                    return True
+                self._stats['rejected'] += 1
+                return False
+            if self._state == OPEN:
+                self._stats['rejected'] += 1
+                return False
+            return True
+
+    def record_success(self):
+        """记录一次成功的请求"""
+        with self._lock:
+            self._stats['success'] += 1
+            self._failures = 0
+            if self._state != CLOSED:
+                logging.info(f"熔断器 {self.name} 探测成功，恢复正常请求")
+                self._state = CLOSED
+                self._probe_started = None
+
+    def record_failure(self):
+        """记录一次失败的请求"""
+        with self._lock:
+            self._stats['failure'] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                if self._state == CLOSED:
+                    logging.warning(f"熔断器 {self.name} 连续失败 {self._failures} 次，暂停请求 {self.cooldown:.0f} 秒")
+                else:
+                    logging.warning(f"熔断器 {self.name} 探测失败，继续暂停请求 {self.cooldown:.0f} 秒")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+                self._stats['opened'] += 1
+
+    def stats(self):
+        """返回当前状态、连续失败次数和各类请求计数"""
+        with self._lock:
+            return dict(self._stats, state=self._state, consecutive_failures=self._failures)
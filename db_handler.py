@@ -1,16 +1,65 @@
 import sqlite3
 import os
+import time
 from datetime import datetime
 import logging
+import urllib.parse
+
+# 数据库性能配置的默认值，可在 config.ini 的 [database] 部分覆盖
+DEFAULT_PROFILE = {
+    'journal_mode': 'WAL',        # WAL 模式下读写互不阻塞
+    'synchronous': 'NORMAL',      # WAL 模式下 NORMAL 已能保证数据库不损坏
+    'cache_size': '-20000',       # 负数表示 KB，约 20MB 页缓存
+    'mmap_size': '268435456',     # 256MB 内存映射
+    'temp_store': 'MEMORY',
+    'busy_timeout': '5000',       # 遇到锁时最多等待的毫秒数
+}
+
+# 各项配置允许的取值，PRAGMA 无法使用参数绑定，需先校验
+PROFILE_CHOICES = {
+    'journal_mode': {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'},
+}
+
+# 当前数据库结构版本，每个版本对应一个 _migrate_v<N> 方法
+SCHEMA_VERSION = 8
+# 增量刷新使用的 change_seq 列从该版本开始提供
+CHANGE_SEQ_VERSION = 8
+# 已提示过结构版本过低的数据库，只读进程反复打开同一数据库时只提示一次
+_outdated_warned = set()
+
+# posts 表的列，按列查询时用于校验列名
+POST_COLUMNS = {
+    'id', 'post_id', 'forum_id', 'title', 'content', 'keywords', 'url', 'timestamp', 'author', 'author_id',
+    'created_at', 'updated_at', 'view_count', 'reply_count', 'like_count', 'change_seq',
+}
+
+# 论坛ID到名称的映射，posts.forum_id 中保存的是论坛名称
+FORUM_NAMES = {'52': '候车室', '61': '攻略区'}
+
+def forum_name(forum_id):
+    """论坛ID转换为 posts 表中保存的论坛名称，已经是名称或未知论坛时原样返回"""
+    forum_id = str(forum_id)
+    return FORUM_NAMES.get(forum_id, forum_id)
+
+# trigram 分词至少需要3个字符才能命中全文索引
+FTS_MIN_QUERY_LENGTH = 3
 
 class DBHandler:
-    def __init__(self, db_path='posts.db'):
-        """初始化数据库连接"""
+    def __init__(self, db_path='posts.db', profile=None, read_only=False):
+        """
+        初始化数据库连接
+        :param db_path: 数据库文件路径
+        :param profile: 性能配置（如 config['database']），未设置的项使用 DEFAULT_PROFILE
+        :param read_only: 只读模式，不执行迁移也不修改数据库，供查看器等只读进程使用
+        """
         self.db_path = db_path
         self.conn = None
-        self._init_db()
+        self.read_only = read_only
+        self.profile = self._load_profile(profile)
         
-        # 配置日志
+        # 配置日志（需在迁移输出日志之前完成）
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -19,18 +68,56 @@ class DBHandler:
                 logging.StreamHandler()
             ]
         )
+        self._init_db()
+    
+    @staticmethod
+    def _load_profile(profile):
+        """合并并校验性能配置"""
+        merged = dict(DEFAULT_PROFILE)
+        for key in DEFAULT_PROFILE:
+            if profile and profile.get(key):
+                merged[key] = str(profile.get(key)).strip()
+        for key, value in merged.items():
+            choices = PROFILE_CHOICES.get(key)
+            if choices is not None:
+                merged[key] = value.upper()
+                if merged[key] not in choices:
+                    raise ValueError(f"数据库配置 {key} 的取值无效: {value}")
+            else:
+                merged[key] = str(int(value))
+        return merged
     
     def _init_db(self):
-        """初始化数据库表结构"""
+        """初始化数据库表结构，并按版本号依次执行尚未执行的迁移"""
         self._connect()
-        cursor = self.conn.cursor()
-        
-        # 删除旧表（如果存在）
-        cursor.execute('DROP TABLE IF EXISTS posts')
-        
-        # 创建新帖子表
+        current = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        self.schema_version = current
+        if self.read_only:
+            if current < SCHEMA_VERSION and self.db_path not in _outdated_warned:
+                _outdated_warned.add(self.db_path)
+                logging.warning(f"数据库结构版本为 {current}，低于当前版本 {SCHEMA_VERSION}，请先运行监控程序完成升级")
+            self.fts_enabled = self._table_exists('posts_fts')
+            return
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            with self.conn:
+                getattr(self, f'_migrate_v{version}')(self.conn.cursor())
+                self.conn.execute(f'PRAGMA user_version = {version}')
+            logging.info(f"数据库结构已升级到版本 {version}")
+        self.schema_version = max(current, SCHEMA_VERSION)
+        self.fts_enabled = self._table_exists('posts_fts')
+    
+    def _table_exists(self, name):
+        """检查表是否存在"""
+        row = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+        return row is not None
+    
+    def _migrate_v1(self, cursor):
+        """基础表结构（兼容版本号引入之前创建的数据库）"""
+        # 创建帖子表（保留已有数据，重启后不会丢失历史）
         cursor.execute('''
-        CREATE TABLE posts (
+        CREATE TABLE IF NOT EXISTS posts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             post_id TEXT NOT NULL UNIQUE,
             forum_id INTEGER NOT NULL,
@@ -58,34 +145,215 @@ class DBHandler:
         )
         ''')
         
-        self.conn.commit()
+        # 创建已见帖子表，用于重启后恢复去重状态
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS seen_posts (
+            forum_id INTEGER NOT NULL,
+            post_id TEXT NOT NULL,
+            seen_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (forum_id, post_id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_seen_posts_forum_seen_at ON seen_posts (forum_id, seen_at)
+        ''')
+    
+    def _migrate_v2(self, cursor):
+        """为按论坛和时间筛选、排序的查询添加索引"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_forum_timestamp ON posts (forum_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp)')
+    
+    def _migrate_v3(self, cursor):
+        """创建标题和正文的全文索引（需要 SQLite 3.34+ 的 FTS5 trigram 分词器）"""
+        try:
+            cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                title, content, content='posts', content_rowid='id', tokenize='trigram'
+            )
+            ''')
+        except sqlite3.OperationalError as e:
+            logging.warning(f"当前SQLite不支持FTS5 trigram分词，搜索将使用LIKE查询: {e}")
+            return
+        
+        # 通过触发器与 posts 表保持同步
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO posts_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        ''')
+        
+        # 为已有数据建立索引
+        cursor.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+    
+    def _migrate_v4(self, cursor):
+        """创建帖子与关键词的关联表，并从 posts.keywords 回填"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_keywords (
+            post_id TEXT NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            PRIMARY KEY (post_id, keyword_id)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_post_keywords_keyword ON post_keywords (keyword_id, post_id)')
+        
+        cursor.execute("SELECT post_id, keywords FROM posts WHERE keywords IS NOT NULL AND keywords != ''")
+        self._sync_post_keywords(cursor, cursor.fetchall())
+        # 旧版本每次重复保存都会累加计数，这里按关联表重新统计全部关键词
+        cursor.execute('''
+        UPDATE keywords SET count = (SELECT COUNT(*) FROM post_keywords WHERE keyword_id = keywords.id)
+        ''')
+    
+    def _migrate_v5(self, cursor):
+        """创建通知发件箱，通知与帖子在同一事务中写入，由后台分发器发送"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            enqueued_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT,
+            UNIQUE (idempotency_key, channel)
+        )
+        ''')
+        # 只索引待发送的通知，已发送的历史记录不影响取件速度
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (channel, next_attempt_at)
+        WHERE status = 'pending'
+        ''')
+    
+    def _migrate_v6(self, cursor):
+        """创建增量抓取的高水位表，记录每个论坛每种排序方式已抓取到的位置"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_watermarks (
+            forum_id INTEGER NOT NULL,
+            sort_type INTEGER NOT NULL,
+            watermark REAL NOT NULL,
+            updated_at TEXT,
+            PRIMARY KEY (forum_id, sort_type)
+        ) WITHOUT ROWID
+        ''')
+    
+    def _migrate_v7(self, cursor):
+        """创建历史回填的断点表，中断后从上次写入的位置继续"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            forum_id INTEGER PRIMARY KEY,
+            since TEXT NOT NULL,
+            last_id TEXT NOT NULL DEFAULT '',
+            pages INTEGER NOT NULL DEFAULT 0,
+            posts INTEGER NOT NULL DEFAULT 0,
+            matched INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        )
+        ''')
+    
+    def _migrate_v8(self, cursor):
+        """
+        为帖子添加变更序号，每次新增或更新帖子时取当前最大值加一
+        
+        timestamp 只精确到秒，同一秒内先后提交的更新无法区分先后，
+        查看器的增量刷新以变更序号作为水位，不会漏掉任何写入。
+        """
+        cursor.execute('ALTER TABLE posts ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('UPDATE posts SET change_seq = id')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_change_seq ON posts (change_seq)')
+    
+    def _sync_post_keywords(self, cursor, post_keywords):
+        """
+        用新的匹配结果替换帖子的关键词关联，并重新统计受影响关键词的出现次数
+        :param post_keywords: [(post_id, '、'分隔的关键词字符串), ...]
+        """
+        post_ids = [(post_id,) for post_id, _ in post_keywords]
+        pairs = [
+            (post_id, keyword)
+            for post_id, keywords in post_keywords if keywords
+            for keyword in keywords.split('、') if keyword
+        ]
+        
+        # 记录更新前关联的关键词，更新后它们的计数也可能变化
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS affected_keywords (keyword_id INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM affected_keywords')
+        cursor.executemany('''
+        INSERT OR IGNORE INTO affected_keywords SELECT keyword_id FROM post_keywords WHERE post_id = ?
+        ''', post_ids)
+        cursor.executemany('DELETE FROM post_keywords WHERE post_id = ?', post_ids)
+        
+        cursor.executemany('INSERT OR IGNORE INTO keywords (keyword, count) VALUES (?, 0)',
+                           [(keyword,) for keyword in {keyword for _, keyword in pairs}])
+        cursor.executemany('''
+        INSERT OR IGNORE INTO post_keywords (post_id, keyword_id) SELECT ?, id FROM keywords WHERE keyword = ?
+        ''', pairs)
+        cursor.executemany('''
+        INSERT OR IGNORE INTO affected_keywords SELECT id FROM keywords WHERE keyword = ?
+        ''', [(keyword,) for _, keyword in pairs])
+        
+        # 计数直接由关联表统计，重复保存同一帖子不会让计数漂移
+        cursor.execute('''
+        UPDATE keywords SET count = (SELECT COUNT(*) FROM post_keywords WHERE keyword_id = keywords.id)
+        WHERE id IN (SELECT keyword_id FROM affected_keywords)
+        ''')
         
     def _connect(self):
-        """建立数据库连接"""
+        """建立数据库连接并应用性能配置"""
         if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path)
+            profile = self.profile
+            if self.read_only:
+                # 只读连接：数据库不存在时直接报错，不会创建空文件；WAL 模式由写入方设置并保存在文件中
+                uri = f"file:{urllib.parse.quote(os.path.abspath(self.db_path))}?mode=ro"
+                self.conn = sqlite3.connect(uri, uri=True, timeout=int(profile['busy_timeout']) / 1000)
+                self.conn.execute("PRAGMA query_only = ON")
+            else:
+                self.conn = sqlite3.connect(self.db_path, timeout=int(profile['busy_timeout']) / 1000)
+                self.conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+                self.conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
             self.conn.row_factory = sqlite3.Row
+            self.conn.execute(f"PRAGMA cache_size = {profile['cache_size']}")
+            self.conn.execute(f"PRAGMA mmap_size = {profile['mmap_size']}")
+            self.conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+            self.conn.execute(f"PRAGMA busy_timeout = {profile['busy_timeout']}")
     
     def save_post(self, post_data):
         """保存帖子数据到数据库"""
+        return self.save_posts_bulk([post_data])
+    
+    def save_posts_bulk(self, posts, outbox=None):
+        """
+        在一个事务中批量保存帖子数据
+        :param posts: 帖子数据字典列表
+        :param outbox: 需要随帖子一起写入发件箱的通知 [(幂等键, 渠道, JSON负载), ...]，
+                       幂等键已存在的通知会被忽略
+        :return: 是否保存成功
+        """
+        if not posts:
+            return True
         try:
             self._connect()
-            cursor = self.conn.cursor()
-            
-            # 插入或更新帖子数据
-            cursor.execute('''
-            INSERT OR REPLACE INTO posts 
-            (post_id, forum_id, title, content, keywords, url, timestamp,
-             author, author_id, created_at, updated_at, view_count, reply_count, like_count)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            rows = [(
                 post_data['post_id'],
                 post_data['forum_id'],
                 post_data['title'],
                 post_data['content'],
                 post_data['keywords'],
                 post_data['url'],
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                timestamp,
                 post_data.get('author', ''),
                 post_data.get('author_id', ''),
                 post_data.get('created_at', ''),
@@ -93,70 +361,199 @@ class DBHandler:
                 post_data.get('view_count', 0),
                 post_data.get('reply_count', 0),
                 post_data.get('like_count', 0)
-            ))
+            ) for post_data in posts]
             
-            # 更新关键词统计
-            if post_data['keywords']:
-                keywords = post_data['keywords'].split('、')
-                for keyword in keywords:
-                    cursor.execute('''
-                    INSERT OR IGNORE INTO keywords (keyword) VALUES (?)
-                    ''', (keyword,))
-                    cursor.execute('''
-                    UPDATE keywords SET count = count + 1 WHERE keyword = ?
-                    ''', (keyword,))
+            with self.conn:
+                # 插入或更新帖子数据，冲突时原地更新，保留原有的自增ID
+                self.conn.executemany('''
+                INSERT INTO posts
+                (post_id, forum_id, title, content, keywords, url, timestamp,
+                 author, author_id, created_at, updated_at, view_count, reply_count, like_count, change_seq)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                        (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM posts))
+                ON CONFLICT(post_id) DO UPDATE SET
+                    forum_id = excluded.forum_id,
+                    title = excluded.title,
+                    content = excluded.content,
+                    keywords = excluded.keywords,
+                    url = excluded.url,
+                    timestamp = excluded.timestamp,
+                    author = excluded.author,
+                    author_id = excluded.author_id,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at,
+                    view_count = excluded.view_count,
+                    reply_count = excluded.reply_count,
+                    like_count = excluded.like_count,
+                    change_seq = (SELECT MAX(change_seq) + 1 FROM posts)
+                ''', rows)
+                
+                # 更新帖子与关键词的关联及关键词统计
+                self._sync_post_keywords(self.conn.cursor(), [
+                    (post_data['post_id'], post_data['keywords']) for post_data in posts
+                ])
+                
+                # 通知与帖子同一事务提交，崩溃时不会出现帖子已保存而通知丢失的情况
+                if outbox:
+                    now = time.time()
+                    self.conn.executemany('''
+                    INSERT OR IGNORE INTO outbox (idempotency_key, channel, payload, next_attempt_at, enqueued_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ''', [(key, channel, payload, now, now) for key, channel, payload in outbox])
             
-            self.conn.commit()
-            logging.info(f"成功保存帖子: {post_data['post_id']}")
+            logging.info(f"成功保存 {len(posts)} 条帖子")
             return True
         except Exception as e:
             logging.error(f"保存帖子失败: {e}")
             return False
     
-    def get_posts(self, filters=None):
-        """根据条件查询帖子数据"""
-        try:
-            self._connect()
-            cursor = self.conn.cursor()
+    def _build_posts_query(self, filters, columns, limit, offset, by_time):
+        """生成 get_posts 和 iter_posts 使用的查询语句和参数"""
+        if columns:
+            invalid = set(columns) - POST_COLUMNS
+            if invalid:
+                raise ValueError(f"未知的列: {', '.join(sorted(invalid))}")
+            select = ', '.join(f"posts.{column}" for column in columns)
+        else:
+            select = "posts.*"
+        query = f"SELECT {select} FROM posts"
+        # 以 id 作为同一时间戳内的次序，保证分页结果稳定
+        order_by = "posts.timestamp DESC, posts.id DESC"
+        params = []
+        
+        if filters:
+            conditions = []
             
-            query = "SELECT * FROM posts"
-            params = []
+            search_text = filters.get('search_text')
+            if search_text and self.fts_enabled and len(search_text) >= FTS_MIN_QUERY_LENGTH:
+                # 使用短语查询，trigram 分词下等价于子串匹配
+                query = (f"SELECT {select}, snippet(posts_fts, -1, '【', '】', '...', 16) AS snippet "
+                         "FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid")
+                conditions.append("posts_fts MATCH ?")
+                params.append('"' + search_text.replace('"', '""') + '"')
+                if not by_time:
+                    order_by = "posts_fts.rank"
+            elif search_text:
+                conditions.append("(posts.title LIKE ? OR posts.content LIKE ?)")
+                params.extend([f"%{search_text}%", f"%{search_text}%"])
             
-            if filters:
-                conditions = []
-                
-                if 'forum_id' in filters:
-                    conditions.append("forum_id = ?")
-                    params.append(filters['forum_id'])
-                
-                if 'keywords' in filters:
-                    keyword_conditions = []
-                    for keyword in filters['keywords']:
-                        keyword_conditions.append("keywords LIKE ?")
-                        params.append(f"%{keyword}%")
-                    conditions.append(f"({' OR '.join(keyword_conditions)})")
-                
-                if 'start_date' in filters and 'end_date' in filters:
-                    conditions.append("timestamp BETWEEN ? AND ?")
-                    params.extend([filters['start_date'], filters['end_date']])
-                
-                if 'search_text' in filters:
-                    conditions.append("(title LIKE ? OR content LIKE ?)")
-                    params.extend([f"%{filters['search_text']}%", f"%{filters['search_text']}%"]) 
-                
-                if conditions:
-                    query += " WHERE " + " AND ".join(conditions)
+            if 'forum_id' in filters:
+                forum_ids = filters['forum_id']
+                if isinstance(forum_ids, (list, tuple, set)):
+                    conditions.append(f"posts.forum_id IN ({','.join('?' * len(forum_ids))})")
+                    params.extend(forum_ids)
+                else:
+                    conditions.append("posts.forum_id = ?")
+                    params.append(forum_ids)
             
-            query += " ORDER BY timestamp DESC"
-            cursor.execute(query, params)
+            if filters.get('keywords'):
+                # 通过关联表按关键词精确查找
+                placeholders = ','.join('?' * len(filters['keywords']))
+                conditions.append(f'''posts.post_id IN (
+                    SELECT post_keywords.post_id FROM post_keywords
+                    JOIN keywords ON keywords.id = post_keywords.keyword_id
+                    WHERE keywords.keyword IN ({placeholders}))''')
+                params.extend(filters['keywords'])
+            
+            if filters.get('start_date') is not None:
+                conditions.append("posts.timestamp >= ?")
+                params.append(filters['start_date'])
+            if filters.get('end_date') is not None:
+                conditions.append("posts.timestamp <= ?")
+                params.append(filters['end_date'])
             
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(row))
+            if filters.get('after') is not None:
+                conditions.append("posts.change_seq > ?")
+                params.append(filters['after'])
             
-            return results
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+        
+        query += f" ORDER BY {order_by}"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        return query, params
+    
+    def get_posts(self, filters=None, columns=None, limit=None, offset=0, by_time=False):
+        """
+        根据条件查询帖子数据
+        
+        search_text 在全文索引可用且长度不少于3个字符时走 FTS5 查询，结果按相关度排序，
+        并附带 snippet 字段（命中处用【】标出）；否则退回 LIKE 查询，按时间倒序排列。
+        forum_id 可以是单个值或列表；start_date 和 end_date 可单独使用；
+        after 为变更序号，只返回该序号之后新增或更新的帖子。
+        :param columns: 只查询指定的列，为None时查询全部列
+        :param limit: 最多返回的行数，为None时不限制
+        :param offset: 跳过的行数，与 limit 一起用于分页
+        :param by_time: 全文搜索时也按时间倒序排列（分页浏览时顺序稳定）
+        """
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute(*self._build_posts_query(filters, columns, limit, offset, by_time))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"查询帖子失败: {e}")
+            return []
+    
+    def iter_posts(self, filters=None, columns=None, limit=None, offset=0, by_time=False, chunk_size=500):
+        """
+        与 get_posts 条件相同，但分块返回结果，读取大量数据时不必等待全部结果
+        :param chunk_size: 每块的行数
+        :return: 生成器，每次产出一个字典列表；查询被 interrupt() 中断时提前结束
+        """
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute(*self._build_posts_query(filters, columns, limit, offset, by_time))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [dict(row) for row in rows]
+        except sqlite3.OperationalError as e:
+            if str(e) != 'interrupted':
+                logging.error(f"查询帖子失败: {e}")
         except Exception as e:
             logging.error(f"查询帖子失败: {e}")
+    
+    def interrupt(self):
+        """中断当前连接上正在执行的查询，可以从其他线程调用"""
+        conn = self.conn
+        if conn is not None:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                # 连接已关闭
+                pass
+    
+    def get_latest_write(self):
+        """
+        获取最近一次新增或更新帖子的变更序号，与 get_posts 的 after 条件配合读取之后写入的帖子
+        :return: 变更序号，表为空或数据库结构版本过低时返回None
+        """
+        if self.schema_version < CHANGE_SEQ_VERSION:
+            # 只读打开的旧版本数据库没有 change_seq 列，调用方应关闭增量刷新
+            return None
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT MAX(change_seq) FROM posts")
+            return cursor.fetchone()[0]
+        except Exception as e:
+            logging.error(f"获取最近变更序号失败: {e}")
+            return None
+    
+    def get_forum_ids(self):
+        """获取帖子表中出现过的全部论坛"""
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT DISTINCT forum_id FROM posts ORDER BY forum_id")
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"获取论坛列表失败: {e}")
             return []
     
     def get_keywords(self):
@@ -171,12 +568,323 @@ class DBHandler:
             logging.error(f"获取关键词失败: {e}")
             return []
     
+    def get_posts_by_keyword(self, keyword, limit=None):
+        """按关键词查询帖子，按时间倒序排列"""
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            SELECT posts.* FROM keywords
+            JOIN post_keywords ON post_keywords.keyword_id = keywords.id
+            JOIN posts ON posts.post_id = post_keywords.post_id
+            WHERE keywords.keyword = ?
+            ORDER BY posts.timestamp DESC
+            LIMIT ?
+            ''', (keyword, -1 if limit is None else limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"按关键词查询帖子失败: {e}")
+            return []
+    
+    def get_keyword_counts(self, forum_id=None, start_date=None, end_date=None):
+        """
+        统计关键词命中的帖子数
+        :param forum_id: 只统计指定论坛，可以是论坛ID（如52）或论坛名称
+        :param start_date: 帖子发布时间的起始时间（含），本地时间字符串如 '2024-01-01' 或 '2024-01-01 12:00:00'，
+                           与 end_date 可单独使用；按发布时间而不是保存时间统计，帖子更新后不会移到新的时间段
+        :param end_date: 帖子发布时间的结束时间（含）
+        """
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            conditions = []
+            params = []
+            if forum_id is not None:
+                conditions.append("posts.forum_id = ?")
+                params.append(forum_name(forum_id))
+            # created_at 是接口返回的 unix 时间戳，起止时间按本地时间转换后比较
+            if start_date is not None:
+                conditions.append("CAST(posts.created_at AS REAL) >= CAST(strftime('%s', ?, 'utc') AS REAL)")
+                params.append(start_date)
+            if end_date is not None:
+                conditions.append("CAST(posts.created_at AS REAL) <= CAST(strftime('%s', ?, 'utc') AS REAL)")
+                params.append(end_date)
+            
+            query = '''
+            SELECT keywords.keyword, COUNT(*) AS count FROM post_keywords
+            JOIN keywords ON keywords.id = post_keywords.keyword_id
+            '''
+            if conditions:
+                query += " JOIN posts ON posts.post_id = post_keywords.post_id WHERE " + " AND ".join(conditions)
+            query += " GROUP BY keywords.id ORDER BY count DESC"
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"统计关键词失败: {e}")
+            return []
+    
+    def get_keyword_cooccurrence(self, keyword=None, limit=20):
+        """
+        统计同一帖子中同时出现的关键词对
+        :param keyword: 只统计与该关键词同时出现的关键词
+        :param limit: 返回的关键词对数量
+        """
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            if keyword is not None:
+                cursor.execute('''
+                SELECT k1.keyword AS keyword, k2.keyword AS other, COUNT(*) AS count
+                FROM keywords k1
+                JOIN post_keywords a ON a.keyword_id = k1.id
+                JOIN post_keywords b ON b.post_id = a.post_id AND b.keyword_id != a.keyword_id
+                JOIN keywords k2 ON k2.id = b.keyword_id
+                WHERE k1.keyword = ?
+                GROUP BY b.keyword_id ORDER BY count DESC LIMIT ?
+                ''', (keyword, limit))
+            else:
+                cursor.execute('''
+                SELECT k1.keyword AS keyword, k2.keyword AS other, COUNT(*) AS count
+                FROM post_keywords a
+                JOIN post_keywords b ON b.post_id = a.post_id AND b.keyword_id > a.keyword_id
+                JOIN keywords k1 ON k1.id = a.keyword_id
+                JOIN keywords k2 ON k2.id = b.keyword_id
+                GROUP BY a.keyword_id, b.keyword_id ORDER BY count DESC LIMIT ?
+                ''', (limit,))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"统计关键词共现失败: {e}")
+            return []
+    
+    def fetch_outbox(self, channel, limit=50):
+        """取出渠道中已到发送时间的待发送通知，按入队顺序排列"""
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            SELECT id, idempotency_key, payload, attempts, enqueued_at FROM outbox
+            WHERE channel = ? AND status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at, id LIMIT ?
+            ''', (channel, time.time(), limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"读取发件箱失败: {e}")
+            return []
+    
+    def next_outbox_attempt(self, channel):
+        """返回渠道中最早的待发送时间，没有待发送通知时返回None"""
+        try:
+            self._connect()
+            row = self.conn.execute('''
+            SELECT MIN(next_attempt_at) FROM outbox WHERE channel = ? AND status = 'pending'
+            ''', (channel,)).fetchone()
+            return row[0]
+        except Exception as e:
+            logging.error(f"读取发件箱失败: {e}")
+            return None
+    
+    def count_pending_outbox(self, channel):
+        """统计渠道中待发送的通知数"""
+        try:
+            self._connect()
+            row = self.conn.execute('''
+            SELECT COUNT(*) FROM outbox WHERE channel = ? AND status = 'pending'
+            ''', (channel,)).fetchone()
+            return row[0]
+        except Exception as e:
+            logging.error(f"统计发件箱失败: {e}")
+            return 0
+    
+    def mark_outbox_sent(self, ids):
+        """将通知标记为已发送"""
+        try:
+            self._connect()
+            now = time.time()
+            with self.conn:
+                self.conn.executemany('''
+                UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?
+                ''', [(now, outbox_id) for outbox_id in ids])
+            return True
+        except Exception as e:
+            logging.error(f"更新发件箱失败: {e}")
+            return False
+    
+    def reschedule_outbox(self, updates, error):
+        """
+        记录发送失败并安排重试
+        :param updates: [(id, 下次发送时间, 状态), ...]，状态为 'pending' 或放弃重试时的 'dead'
+        :param error: 失败原因
+        """
+        try:
+            self._connect()
+            with self.conn:
+                self.conn.executemany('''
+                UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, status = ?, last_error = ?
+                WHERE id = ?
+                ''', [(next_attempt_at, status, error, outbox_id) for outbox_id, next_attempt_at, status in updates])
+            return True
+        except Exception as e:
+            logging.error(f"更新发件箱失败: {e}")
+            return False
+    
+    def purge_outbox(self, before):
+        """删除指定时间（unix时间戳）之前已发送的通知"""
+        try:
+            self._connect()
+            with self.conn:
+                cursor = self.conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (before,))
+            return cursor.rowcount
+        except Exception as e:
+            logging.error(f"清理发件箱失败: {e}")
+            return 0
+    
     def close(self):
         """关闭数据库连接"""
         if self.conn:
             self.conn.close()
             self.conn = None
 
+    def mark_seen(self, forum_id, post_ids):
+        """批量记录已见过的帖子ID"""
+        if not post_ids:
+            return True
+        try:
+            self._connect()
+            seen_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.conn:
+                self.conn.executemany('''
+                INSERT INTO seen_posts (forum_id, post_id, seen_at) VALUES (?, ?, ?)
+                ON CONFLICT(forum_id, post_id) DO UPDATE SET seen_at = excluded.seen_at
+                ''', [(forum_id, post_id, seen_at) for post_id in post_ids])
+            return True
+        except Exception as e:
+            logging.error(f"记录已见帖子失败: {e}")
+            return False
+    
+    def is_seen(self, forum_id, post_id):
+        """精确检查帖子ID是否见过，用于确认布隆过滤器的命中"""
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT 1 FROM seen_posts WHERE forum_id = ? AND post_id = ?', (forum_id, post_id))
+            return cursor.fetchone() is not None
+        except Exception as e:
+            logging.error(f"查询已见帖子失败: {e}")
+            # 无法确认时按未见处理，宁可重复匹配也不漏掉新帖子
+            return False
+    
+    def load_seen_post_ids(self, forum_id, limit=5000):
+        """按时间倒序加载论坛最近见过的帖子ID"""
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            cursor.execute('''
+            SELECT post_id FROM seen_posts WHERE forum_id = ?
+            ORDER BY seen_at DESC LIMIT ?
+            ''', (forum_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"加载已见帖子失败: {e}")
+            return []
+    
+    def prune_seen_posts(self, before):
+        """删除早于指定时间的已见帖子记录"""
+        try:
+            self._connect()
+            with self.conn:
+                cursor = self.conn.execute('DELETE FROM seen_posts WHERE seen_at < ?', (before,))
+            return cursor.rowcount
+        except Exception as e:
+            logging.error(f"清理已见帖子失败: {e}")
+            return 0
+
+    def load_watermarks(self):
+        """
+        加载增量抓取的高水位
+        :return: {(论坛ID, 排序方式): 高水位}
+        """
+        try:
+            self._connect()
+            cursor = self.conn.execute('SELECT forum_id, sort_type, watermark FROM crawl_watermarks')
+            return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"加载抓取高水位失败: {e}")
+            return {}
+    
+    def save_watermarks(self, watermarks):
+        """
+        批量保存增量抓取的高水位，只会前进不会后退
+        :param watermarks: {(论坛ID, 排序方式): 高水位}
+        """
+        if not watermarks:
+            return True
+        try:
+            self._connect()
+            updated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.conn:
+                self.conn.executemany('''
+                INSERT INTO crawl_watermarks (forum_id, sort_type, watermark, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(forum_id, sort_type) DO UPDATE SET
+                    watermark = MAX(watermark, excluded.watermark), updated_at = excluded.updated_at
+                ''', [(forum_id, sort_type, watermark, updated_at)
+                      for (forum_id, sort_type), watermark in watermarks.items()])
+            return True
+        except Exception as e:
+            logging.error(f"保存抓取高水位失败: {e}")
+            return False
+
+    def load_backfill_checkpoint(self, forum_id):
+        """
+        加载论坛的历史回填断点
+        :return: 断点字典（since, last_id, pages, posts, matched, done），不存在时返回None
+        """
+        try:
+            self._connect()
+            cursor = self.conn.execute('''
+            SELECT since, last_id, pages, posts, matched, done FROM backfill_checkpoints WHERE forum_id = ?
+            ''', (forum_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logging.error(f"加载回填断点失败: {e}")
+            return None
+    
+    def save_backfill_checkpoint(self, forum_id, checkpoint):
+        """
+        保存论坛的历史回填断点
+        :param checkpoint: 断点字典（since, last_id, pages, posts, matched, done）
+        """
+        try:
+            self._connect()
+            with self.conn:
+                self.conn.execute('''
+                INSERT OR REPLACE INTO backfill_checkpoints
+                (forum_id, since, last_id, pages, posts, matched, done, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    forum_id, checkpoint['since'], checkpoint['last_id'], checkpoint['pages'],
+                    checkpoint['posts'], checkpoint['matched'], int(checkpoint['done']),
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ))
+            return True
+        except Exception as e:
+            logging.error(f"保存回填断点失败: {e}")
+            return False
+
+    def existing_post_ids(self, post_ids):
+        """批量查询已存在的帖子ID"""
+        if not post_ids:
+            return set()
+        try:
+            self._connect()
+            cursor = self.conn.cursor()
+            placeholders = ','.join('?' * len(post_ids))
+            cursor.execute(f'SELECT post_id FROM posts WHERE post_id IN ({placeholders})', list(post_ids))
+            return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"查询已存在帖子失败: {e}")
+            return set()
+
     def post_exists(self, post_id):
         """检查帖子是否已存在"""
         try:
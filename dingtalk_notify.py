@@ -1,6 +1,4 @@
 import os
-import requests
-import json
 import time
 import hmac
 import hashlib
@@ -9,6 +7,7 @@ import urllib.parse
 import logging
 import datetime
 from configparser import ConfigParser
+from notifier_transport import TRANSPORT, check_response
 
 class DingTalkNotifier:
     def __init__(self):
@@ -37,42 +36,58 @@ class DingTalkNotifier:
                 handlers=[logging.StreamHandler()]
             )
     
-    def send_notification(self, title, content, post_url):
-        """发送钉钉通知"""
+    def _post(self, message, title):
+        """签名并发送一条消息"""
         try:
-            message = {
-                "msgtype": "text",
-                "text": {
-                    "content": f"{title}\n\n{content}\n\n查看详情: {post_url}"
-                }
-            }
             timestamp = str(round(time.time() * 1000))
             secret_enc = self.secret.encode('utf-8')
             string_to_sign = '{}\n{}'.format(timestamp, self.secret)
             string_to_sign_enc = string_to_sign.encode('utf-8')
             hmac_code = hmac.new(secret_enc, string_to_sign_enc, digestmod=hashlib.sha256).digest()
             sign = urllib.parse.quote_plus(base64.b64encode(hmac_code))
-            headers = {'Content-Type': 'application/json'}
-            response = requests.post(
-                self.webhook_url+"&timestamp="+timestamp+"&sign="+sign,
-                headers=headers,
-                data=json.dumps(message),
-                timeout=10
-            )
+            # 通过共享传输层发送，复用长连接并在 429/5xx 时自动重试
+            response = TRANSPORT.post_json(self.webhook_url+"&timestamp="+timestamp+"&sign="+sign, message)
             
-            if response.status_code == 200:
+            # 限流和被拒绝的消息同样返回 HTTP 200，需要检查响应中的 errcode
+            ok, error = check_response(response)
+            if ok:
                 logging.info(f"成功发送钉钉通知: {title}")
                 return True
             else:
-                logging.error(f"发送钉钉通知失败: {response.text}")
+                logging.error(f"发送钉钉通知失败: {error}")
                 return False
         except Exception as e:
             logging.error(f"发送钉钉通知时出错: {e}")
             return False
+    
+    def send_notification(self, title, content, post_url):
+        """发送钉钉通知"""
+        message = {
+            "msgtype": "text",
+            "text": {
+                "content": f"{title}\n\n{content}\n\n查看详情: {post_url}"
+            }
+        }
+        return self._post(message, title)
+    
+    def send_markdown(self, title, text):
+        """发送钉钉 markdown 消息"""
+        message = {
+            "msgtype": "markdown",
+            "markdown": {
+                "title": title,
+                "text": text
+            }
+        }
+        return self._post(message, title)
 
 # 全局实例
 NOTIFIER = DingTalkNotifier()
 
+# 钉钉机器人限制：单条消息不超过20000字节，每分钟最多20条
+MAX_MESSAGE_BYTES = 20000
+RATE_PER_MINUTE = 20
+
 def notify_new_post(post_data, is_update=False):
     """推送新帖子通知
     :param post_data: 帖子数据
@@ -89,4 +104,8 @@ def notify_new_post(post_data, is_update=False):
     content = f"{content}\n\n更新时间: {timestamp}" if is_update else f"{content}\n\n发布时间: {timestamp}"
     
     url = post_data.get('url', f"https://www.miyoushe.com/sr/article/{post_data.get('post_id', '')}")
-    return NOTIFIER.send_notification(title, content, url)
\ No newline at end of file
+    return NOTIFIER.send_notification(title, content, url)
+
+def send_markdown(title, text):
+    """发送 markdown 消息（用于汇总通知）"""
+    return NOTIFIER.send_markdown(title, text)
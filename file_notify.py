@@ -0,0 +1,60 @@
+import json
+import logging
+import datetime
+import threading
+from configparser import ConfigParser
+
+
+class FileNotifier:
+    """本地文件通知：每条通知以一行 JSON 追加写入文件，便于调试或交给其他程序处理"""
+
+    def __init__(self):
+        """读取 [file] 配置中的输出文件路径"""
+        self.config = ConfigParser()
+        self.config.read('config.ini', encoding='utf-8')
+        self.path = self.config.get('file', 'path')
+        self._lock = threading.Lock()
+
+    def _write(self, record, title):
+        """追加一条记录"""
+        record['time'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            logging.info(f"成功写入文件通知: {title}")
+            return True
+        except Exception as e:
+            logging.error(f"写入文件通知时出错: {e}")
+            return False
+
+    def send_notification(self, post_data, is_update):
+        """写入单条帖子通知"""
+        title = post_data.get('title', post_data.get('subject', '无标题'))
+        record = {'type': 'update' if is_update else 'new', 'post': post_data}
+        return self._write(record, title)
+
+    def send_markdown(self, title, text):
+        """写入 markdown 汇总消息"""
+        return self._write({'type': 'digest', 'title': title, 'text': text}, title)
+
+
+# 全局实例
+NOTIFIER = FileNotifier()
+
+# 本地文件没有平台限制，只限制单条汇总的大小和写入频率
+MAX_MESSAGE_BYTES = 1000000
+RATE_PER_MINUTE = 6000
+
+
+def notify_new_post(post_data, is_update=False):
+    """推送新帖子通知
+    :param post_data: 帖子数据
+    :param is_update: 是否为更新通知
+    """
+    return NOTIFIER.send_notification(post_data, is_update)
+
+
+def send_markdown(title, text):
+    """发送 markdown 消息（用于汇总通知）"""
+    return NOTIFIER.send_markdown(title, text)
@@ -0,0 +1,165 @@
+import os
+import logging
+from collections import deque
+from configparser import ConfigParser, Error as ConfigError
+
+# 配置文件未设置关键词时使用的默认关键词
+DEFAULT_KEYWORDS = [
+    "求助",
+    "提问",
+    "求问",
+    "问问",
+]
+
+
+def load_keywords(config):
+    """
+    从配置中读取关键词列表
+    :param config: 已读取的 ConfigParser
+    :return: 去重后的关键词列表，未配置时返回默认关键词
+    """
+    raw = config.get('keywords', 'keywords', fallback='')
+    keywords = []
+    for keyword in raw.split(','):
+        keyword = keyword.strip()
+        if keyword and keyword not in keywords:
+            keywords.append(keyword)
+    return keywords or list(DEFAULT_KEYWORDS)
+
+
+class KeywordMatcher:
+    """
+    基于 Aho–Corasick 自动机的多关键词匹配器
+
+    自动机在构造时一次性编译，之后每个文本只需扫描一遍即可找出所有关键词及其位置，
+    耗时与关键词数量无关。
+    """
+
+    def __init__(self, keywords):
+        """
+        :param keywords: 关键词列表，匹配结果按此顺序返回
+        """
+        self.keywords = [keyword for keyword in dict.fromkeys(keywords) if keyword]
+        self._goto = [{}]      # 状态转移表
+        self._fail = [0]       # 失配指针
+        self._output = [[]]    # 每个状态命中的关键词下标
+        self._build()
+
+    def _build(self):
+        """构建 trie 并计算失配指针"""
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # 合并失配状态的输出，扫描时无需再沿失配链查找
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        扫描文本
+        :param text: 待匹配文本
+        :return: {关键词下标: [起始位置, ...]}
+        """
+        found = {}
+        if not text or not self.keywords:
+            return found
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        root = goto[0]
+        state = 0
+        for position, char in enumerate(text):
+            # 处于根状态且字符不是任何关键词的首字时直接跳过
+            if not state and char not in root:
+                continue
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            for index in output[state]:
+                found.setdefault(index, []).append(position - len(keywords[index]) + 1)
+        return found
+
+    def match(self, subject, content):
+        """
+        匹配帖子的标题和正文
+        :param subject: 帖子标题
+        :param content: 帖子正文
+        :return: {关键词: [(字段名, 起始位置), ...]}，按关键词配置顺序排列
+        """
+        hits = {}
+        for field, text in (('subject', subject), ('content', content)):
+            for index, positions in self.find(text).items():
+                hits.setdefault(index, []).extend((field, position) for position in positions)
+        return {self.keywords[index]: hits[index] for index in sorted(hits)}
+
+
+class KeywordReloader:
+    """
+    监视配置文件中的关键词，关键词集合变化时重新编译匹配器
+
+    每次检查只做一次 os.stat，文件的修改时间、inode 和大小都没变时不会解析配置；
+    新匹配器编译完成后才整体替换 matcher 属性，正在使用旧匹配器的代码不受影响。
+    """
+
+    def __init__(self, config_path='config.ini'):
+        """
+        :param config_path: 配置文件路径
+        """
+        self.config_path = config_path
+        self._signature = None
+        self.keywords = []
+        self.matcher = KeywordMatcher([])
+        self.check()
+
+    def _stat_signature(self):
+        """返回配置文件的 (修改时间, inode, 大小)，文件不存在时返回None"""
+        try:
+            st = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def check(self):
+        """
+        检查配置文件是否变化，关键词集合变化时重建匹配器
+        :return: 是否替换了匹配器
+        """
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+
+        config = ConfigParser()
+        try:
+            config.read(self.config_path, encoding='utf-8')
+        except (ConfigError, UnicodeDecodeError) as e:
+            # 保留旧匹配器，下次检查时重试
+            logging.error(f"读取关键词配置失败，继续使用原有关键词: {e}")
+            return False
+        self._signature = signature
+
+        keywords = load_keywords(config)
+        if set(keywords) == set(self.keywords):
+            return False
+
+        matcher = KeywordMatcher(keywords)
+        self.keywords, self.matcher = keywords, matcher
+        logging.info(f"关键词已更新，共 {len(keywords)} 个: {', '.join(keywords)}")
+        return True
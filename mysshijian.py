@@ -1,24 +1,43 @@
 import time
+import heapq
 import requests
-import os
 import datetime
-import socket
 import logging
 import configparser
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from db_handler import DBHandler
+from db_handler import DBHandler, forum_name
+from seen_index import SeenIndex
+from keyword_matcher import KeywordReloader
+from notify_dispatcher import NotificationDispatcher
+from notifier_registry import load_channels
+from rate_limiter import TokenBucket
+from circuit_breaker import CircuitBreaker, OPEN
+from retry_policy import RetryPolicy, RetryBudget, parse_retry_after
+from post_record import decode_post_list
 
 # 加载配置文件
 config = configparser.ConfigParser()
 config.read('config.ini', encoding='utf-8')
 
 # 初始化数据库
-DB = DBHandler(config['database']['db_path'])
+DB = DBHandler(config['database']['db_path'], profile=config['database'])
 
 # 从配置获取论坛ID
 forum_ids = [int(id.strip()) for id in config['crawler']['forum_ids'].split(',')]
-cached_post_id = {id: [] for id in forum_ids}
+# 每个论坛独立的已见帖子索引，容量和存活时间有上限，长时间运行内存保持稳定；
+# 已淘汰的旧ID命中布隆过滤器时再查询 seen_posts 表确认，排除误判
+cached_post_id = {
+    id: SeenIndex(
+        max_size=config.getint('crawler', 'seen_max_size', fallback=5000),
+        ttl=config.getfloat('crawler', 'seen_ttl_hours', fallback=168) * 3600,
+        confirm=lambda post_id, forum_id=id: DB.is_seen(forum_id, post_id),
+    )
+    for id in forum_ids
+}
+# 本轮新看到、尚未写入数据库的帖子ID
+pending_seen = {id: [] for id in forum_ids}
 # 配置日志记录
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +51,17 @@ logging.basicConfig(
 # 网络配置
 CONNECTION_TIMEOUT = 15  # 连接超时时间（秒）
 READ_TIMEOUT = 30  # 读取超时时间（秒）
+# 并发抓取上限：同时进行的 (论坛, 排序方式) 请求数
+MAX_WORKERS = config.getint('crawler', 'max_workers', fallback=8)
+# 每个论坛需要抓取的排序方式 1=最新回复 2=最新发布
+SORT_TYPES = (1, 2)
+# 每次请求返回的帖子数
+PAGE_SIZE = 20
+
+# 轮询间隔配置（秒），每个论坛的间隔会在上下限之间根据活跃度自动调整
+POLL_INTERVAL = config.getfloat('crawler', 'poll_interval', fallback=30)
+MIN_POLL_INTERVAL = config.getfloat('crawler', 'min_interval', fallback=10)
+MAX_POLL_INTERVAL = config.getfloat('crawler', 'max_interval', fallback=300)
 
 # 代理设置（如果需要使用代理，取消下面的注释并填入代理地址）
 # 禁用代理，因为日志显示代理连接问题
@@ -42,16 +72,14 @@ PROXIES = None
 #     "https": "http://127.0.0.1:7897"
 # }
 
-# 创建会话并配置重试策略
+# 创建会话；重试统一由 retry_fetch_page 处理，连接层不再重试，避免多层重试叠加
 session = requests.Session()
-retry_strategy = Retry(
-    total=3,  # 总重试次数
-    backoff_factor=1,  # 重试间隔因子
-    status_forcelist=[429, 500, 502, 503, 504],  # 需要重试的HTTP状态码
-    allowed_methods=["GET", "POST"]  # 允许重试的请求方法
-)
-session.mount("http://", HTTPAdapter(max_retries=retry_strategy))
-session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
+# 连接池大小与并发上限保持一致，避免并发请求时连接被丢弃
+session.mount("http://", HTTPAdapter(max_retries=0, pool_maxsize=MAX_WORKERS))
+session.mount("https://", HTTPAdapter(max_retries=0, pool_maxsize=MAX_WORKERS))
+
+# 抓取线程池，所有 (论坛, 排序方式) 组合共享同一个并发上限
+POLL_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="poller")
 
 # 如果配置了代理，则使用代理
 if PROXIES:
@@ -65,40 +93,44 @@ headers = {
     "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
     "Origin": "https://www.miyoushe.com"
 }
-# 自定义关键词列表
-keywords = [
-    "求助", 
-    "提问",      
-    "求问", 
-    "问问", 
-]
-
-post_ids = []
-def check_internet_connection():
-    """检查互联网连接状态"""
-    try:
-        # 尝试连接到百度（作为检测网络连接的参考点）
-        socket.create_connection(("baidu.com", 80), timeout=5)
-        return True
-    except OSError:
-        return False
+# API熔断器：连续失败后暂停请求，冷却后只放行一个探测请求
+BREAKER = CircuitBreaker(
+    failure_threshold=config.getint('crawler', 'breaker_failures', fallback=5),
+    cooldown=config.getfloat('crawler', 'breaker_cooldown', fallback=60),
+)
 
-def get_posts(forum_id, sort_type=1):
+# 关键词从配置文件的[keywords]部分读取并编译为多关键词匹配器，配置变化时在轮询间隙自动重建
+KEYWORDS = KeywordReloader('config.ini')
+
+class FetchError(Exception):
+    """请求帖子列表失败"""
+    
+    def __init__(self, message, retry_after=None):
+        """
+        :param message: 错误信息
+        :param retry_after: 服务端要求的等待秒数，没有时为None
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def request_page(forum_id, sort_type=1, last_id=''):
     """
-    获取论坛帖子
+    请求论坛帖子列表的一页（只负责网络请求，不做去重和关键词匹配）
     :param forum_id: 论坛ID
     :param sort_type: 排序方式 1=最新回复(默认) 2=最新发布
-    :return: 匹配关键词的帖子列表
+    :param last_id: 分页游标，为空时请求第一页
+    :return: (PostRecord列表, 下一页游标, 是否最后一页)
+    :raises FetchError: 请求被熔断、连接失败或响应无法解析
     """
-    # 首先检查网络连接
-    if not check_internet_connection():
-        logging.error("网络连接不可用，请检查您的网络设置")
-        # 返回None表示连接失败，与空列表区分开
-        return None
+    # 熔断器打开时不发出请求
+    if not BREAKER.allow_request():
+        raise FetchError("API请求已熔断", retry_after=BREAKER.retry_after())
         
     # 构建请求URL
-    url = f"https://bbs-api.miyoushe.com/painter/wapi/getRecentForumPostList?forum_id={forum_id}&gids=6&is_good=false&page_size=20&sort_type={sort_type}"
-    post_data = None
+    url = f"https://bbs-api.miyoushe.com/painter/wapi/getRecentForumPostList?forum_id={forum_id}&gids=6&is_good=false&page_size={PAGE_SIZE}&sort_type={sort_type}"
+    if last_id:
+        url += f"&last_id={last_id}"
+    healthy = False
     try:
         logging.info(f"正在请求: {url}")
         response = session.get(
@@ -106,189 +138,548 @@ def get_posts(forum_id, sort_type=1):
             headers=headers, 
             timeout=(CONNECTION_TIMEOUT, READ_TIMEOUT)  # 使用元组设置连接超时和读取超时
         )
+        # 限流和服务端错误计为失败，其他响应说明API可以正常访问
+        healthy = response.status_code != 429 and response.status_code < 500
+        if not healthy:
+            raise FetchError(f"HTTP错误: {response.status_code}",
+                             retry_after=parse_retry_after(response.headers.get('Retry-After')))
         response.raise_for_status()  # 检查HTTP状态码
-        post_data = response.json()
         
-        # 记录API响应内容，便于调试
-        logging.debug(f"API响应内容: {post_data}")
+        # 记录API响应内容，便于调试；只在开启DEBUG时才格式化
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"API响应内容: {response.text}")
         
-        # 检查响应数据结构
-        if "data" not in post_data or "list" not in post_data["data"]:
-            logging.warning(f"响应数据结构异常: 缺少必要字段")
-            return []
-        
-        logging.info(f"成功获取论坛 {forum_id} 的帖子数据")
-    except requests.exceptions.Timeout:
-        logging.error(f"请求超时: {url}")
-        return None
+        # 解码后立即投影为精简记录，不保留完整的响应字典
+        page = decode_post_list(response.content)
+    except requests.exceptions.Timeout as e:
+        raise FetchError(f"请求超时: {url}") from e
     except requests.exceptions.HTTPError as e:
-        logging.error(f"HTTP错误: {e}")
-        return None
+        raise FetchError(f"HTTP错误: {e}") from e
     except requests.exceptions.ConnectionError as e:
-        logging.error(f"连接错误: 无法连接到服务器 - {str(e)}")
-        return None
+        raise FetchError(f"连接错误: 无法连接到服务器 - {str(e)}") from e
     except requests.exceptions.RequestException as e:
-        logging.error(f"请求异常: {e}")
-        return None
+        raise FetchError(f"请求异常: {e}") from e
     except ValueError as e:
-        logging.error(f"JSON解析错误: {e}")
-        return None
+        raise FetchError(f"JSON解析错误: {e}") from e
+    finally:
+        # 熔断器根据真实请求的结果判断API是否可用
+        if healthy:
+            BREAKER.record_success()
+        else:
+            BREAKER.record_failure()
     
-    # 如果没有成功获取数据，直接返回None表示连接或数据结构异常
-    if not post_data or "data" not in post_data or "list" not in post_data["data"]:
-        logging.warning(f"响应数据结构异常或为空")
-        return None
-        
-    hitted_post = []
-    for post in post_data["data"]["list"]:
-        if post["post"]["post_id"] not in cached_post_id[forum_id]:
-            post_ids.append(post["post"]["post_id"])
-            
-            # 记录每个帖子的内容，便于分析
-            logging.debug(f"新帖子ID: {post['post']['post_id']}")
-            logging.debug(f"标题: {post['post']['subject']}")
-            
-            # 检查关键词匹配
-            matched_keywords = []
-            for keyword in keywords:
-                if keyword in post["post"]["subject"] or keyword in post["post"]["content"]:
-                    matched_keywords.append(keyword)
-                    
-            if matched_keywords:
-                logging.info(f"帖子 {post['post']['post_id']} 匹配关键词: {', '.join(matched_keywords)}")
-                hitted_post.append(post)
+    # 检查响应数据结构
+    if page is None:
+        logging.warning(f"响应数据结构异常: 缺少必要字段")
+        return [], '', True
     
-    cached_post_id[forum_id] = post_ids
+    logging.info(f"成功获取论坛 {forum_id} 的帖子数据")
+    return page
+
+def match_posts(posts):
+    """
+    对帖子进行关键词匹配
+    :param posts: 帖子列表
+    :return: 匹配关键词的帖子列表
+    """
+    # 整批帖子使用同一个匹配器，热更新只在批次之间生效
+    matcher = KEYWORDS.matcher
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    hitted_post = []
+    for post in posts:
+        # 记录每个帖子的内容，便于分析
+        if debug:
+            logging.debug(f"新帖子ID: {post.post_id}")
+            logging.debug(f"标题: {post.subject}")
+        
+        # 单次扫描标题和正文，得到所有命中的关键词及位置
+        keyword_hits = matcher.match(post.subject, post.content)
+                
+        if keyword_hits:
+            # 匹配结果随帖子一起传递到 save_to_database，不再重复扫描
+            post.keyword_hits = keyword_hits
+            post.matched_keywords = list(keyword_hits)
+            logging.info(f"帖子 {post.post_id} 匹配关键词: {', '.join(post.matched_keywords)}")
+            hitted_post.append(post)
     return hitted_post
-def save_to_database(posts):
-    """将帖子数据保存到数据库"""
+
+def take_new_posts(forum_id, posts):
+    """
+    筛选出未见过的帖子并记入已见索引
+    :param forum_id: 论坛ID
+    :param posts: 帖子列表
+    :return: 新帖子列表
+    """
+    seen = cached_post_id[forum_id]
+    new_posts = []
+    for post in posts:
+        post_id = post.post_id
+        if post_id not in seen:
+            seen.add(post_id)
+            pending_seen[forum_id].append(post_id)
+            new_posts.append(post)
+    return new_posts
+
+def flush_seen_posts():
+    """将本轮新看到的帖子ID写入数据库，在帖子保存之后调用，崩溃时最多重复处理一轮"""
+    for forum_id, post_id_list in pending_seen.items():
+        if post_id_list and DB.mark_seen(forum_id, post_id_list):
+            post_id_list.clear()
+
+def release_seen_posts(forum_id):
+    """帖子保存失败时把论坛本轮新看到的帖子恢复为未见，下一轮重新匹配和保存"""
+    seen = cached_post_id[forum_id]
+    for post_id in pending_seen[forum_id]:
+        seen.discard(post_id)
+    pending_seen[forum_id].clear()
+
+# 清理过期已见帖子记录的间隔（秒）
+SEEN_PRUNE_INTERVAL = 24 * 3600
+
+def prune_seen_posts():
+    """删除超过 seen_ttl_hours 的已见帖子记录，启动时和运行期间每天执行一次，避免 seen_posts 表无限增长"""
+    ttl_hours = config.getfloat('crawler', 'seen_ttl_hours', fallback=168)
+    expire_before = (datetime.datetime.now() - datetime.timedelta(hours=ttl_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    removed = DB.prune_seen_posts(expire_before)
+    if removed:
+        logging.info(f"已清理 {removed} 条过期的已见帖子记录")
+
+def warm_seen_index():
+    """启动时从数据库恢复最近见过的帖子ID，避免重启后重复匹配和通知"""
+    prune_seen_posts()
+    for forum_id, seen in cached_post_id.items():
+        post_id_list = DB.load_seen_post_ids(forum_id, seen.max_size)
+        # 数据库按时间倒序返回，按从旧到新的顺序放入索引
+        seen.update(reversed(post_id_list))
+        logging.info(f"论坛 {forum_id} 已从数据库恢复 {len(post_id_list)} 个已见帖子ID")
+
+def save_to_database(posts, notify=True):
+    """
+    将一轮匹配到的帖子批量保存到数据库，并发送通知
+    :param posts: 匹配关键词的帖子列表
+    :param notify: 是否发送通知，历史回填时为False
+    :return: 是否保存成功
+    """
     if not posts:
-        return
-        
-    # 论坛ID到名称的映射
-    forum_map = {'52': '候车室', '61': '攻略区'}
+        return True
         
+    post_data_list = []
     for post in posts:
-        # 转换forum_id为中文名称
-        forum_id = str(post['forum_id'])
-        forum_name = forum_map.get(forum_id, forum_id)
+        post_data_list.append({
+            'post_id': post.post_id,
+            # 数据库中保存论坛的中文名称
+            'forum_id': forum_name(post.forum_id),
+            'title': post.subject,
+            'content': post.content,
+            'keywords': '、'.join(post.matched_keywords),
+            'url': f"https://www.miyoushe.com/sr/article/{post.post_id}",
+            'author': post.nickname,
+            'author_id': post.uid,
+            'created_at': post.created_at,
+            'updated_at': post.updated_at,
+            'view_count': post.view_count,
+            'reply_count': post.reply_count,
+            'like_count': post.like_count
+        })
+    
+    # 一次查询找出已存在的帖子，已存在的帖子发送更新通知
+    existing = DB.existing_post_ids([post_data['post_id'] for post_data in post_data_list])
+    outbox = []
+    for post_data in post_data_list if notify else []:
+        notification = {key: post_data[key] for key in ('post_id', 'title', 'content', 'url')}
+        outbox.extend(DISPATCHER.outbox_entries(notification, post_data['post_id'] in existing,
+                                                version=post_data['updated_at']))
+    
+    # 帖子和通知在同一个事务中写入，通知由后台线程从发件箱取出发送，不等待webhook响应
+    if not DB.save_posts_bulk(post_data_list, outbox=outbox):
+        return False
+    logging.info(f"成功保存{len(posts)}条帖子数据到数据库，其中更新 {len(existing)} 条")
+    if outbox:
+        DISPATCHER.wake()
+    return True
+
+# 后台通知分发器，只在 main() 中创建；回填等其他入口不启动发件箱线程，避免与监控进程重复发送
+DISPATCHER = None
+
+def create_dispatcher():
+    """创建通知分发器，按 config.ini 启用的每个渠道各自从发件箱取件、限流发送"""
+    return NotificationDispatcher(
+        load_channels(config),
+        db_factory=lambda: DBHandler(config['database']['db_path'], profile=config['database']),
+        batch_window=config.getfloat('notify', 'batch_window', fallback=2.0),
+        max_batch=config.getint('notify', 'max_batch', fallback=50),
+        max_attempts=config.getint('notify', 'max_attempts', fallback=10),
+        base_backoff=config.getfloat('notify', 'base_backoff', fallback=5.0),
+        max_backoff=config.getfloat('notify', 'max_backoff', fallback=1800.0),
+    )
+
+# 统一的重试策略：带抖动的指数退避，遵循 Retry-After；每轮轮询的重试等待总时长不超过预算
+RETRY_POLICY = RetryPolicy(
+    max_attempts=config.getint('crawler', 'retry_attempts', fallback=4),
+    base_delay=config.getfloat('crawler', 'retry_base_delay', fallback=1),
+    max_delay=config.getfloat('crawler', 'retry_max_delay', fallback=30),
+)
+RETRY_BUDGET = config.getfloat('crawler', 'retry_budget', fallback=60)
+
+# 增量抓取时每个 (论坛, 排序方式) 每轮最多请求的页数
+MAX_PAGES = config.getint('crawler', 'max_pages', fallback=10)
+# 每个 (论坛, 排序方式) 已抓取到的高水位（排序时间戳），启动时从数据库恢复
+WATERMARKS = {}
+# 页数上限内没抓完的区间 [(续抓游标, 区间下限高水位), ...]，下一轮继续向下补抓
+CRAWL_GAPS = {}
+# 本轮推进、尚未写入数据库的高水位
+pending_watermarks = {}
+# 本轮抓取得到、等待帖子保存后才生效的高水位更新 {论坛ID: [(论坛ID, 排序方式, 最高排序值, 缺口), ...]}
+pending_crawls = {}
+
+def post_sort_key(post, sort_type):
+    """
+    帖子在对应排序方式下的排序时间戳，用于和高水位比较
+    :return: 时间戳，无法确定时返回None
+    """
+    try:
+        if sort_type == 2:
+            return float(post.created_at)
+        if post.reply_time:
+            return datetime.datetime.strptime(post.reply_time, '%Y-%m-%d %H:%M:%S').timestamp()
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def retry_fetch_page(forum_id, sort_type, last_id='', budget=None):
+    """
+    按统一重试策略抓取单个 (论坛, 排序方式) 组合的一页，每个组合拥有独立的重试状态
+    :param budget: 本轮轮询的重试预算，为None时只受最大尝试次数限制
+    :return: (帖子列表, 下一页游标, 是否最后一页)，放弃时返回None
+    """
+    for attempt in range(1, RETRY_POLICY.max_attempts + 1):
+        # 同一论坛本轮已有请求放弃时，其余请求也跳过，留到下一轮
+        if budget is not None and budget.has_failed(forum_id):
+            return None
+        try:
+            result = request_page(forum_id, sort_type, last_id)
+            logging.info(f"论坛 {forum_id} 排序 {sort_type} 第{attempt}次尝试成功获取 {len(result[0])} 个帖子")
+            return result
+        except FetchError as e:
+            error = e
         
-        # 发送钉钉通知
-        from dingtalk_notify import notify_new_post
-        notify_new_post(post['post'])
+        logging.warning(f"论坛 {forum_id} 排序 {sort_type} 第{attempt}次尝试获取数据失败: {error}")
+        if attempt == RETRY_POLICY.max_attempts:
+            logging.warning(f"论坛 {forum_id} 排序 {sort_type} 已达到最大尝试次数 {RETRY_POLICY.max_attempts}")
+            break
+        delay = RETRY_POLICY.backoff(attempt, error.retry_after)
+        if budget is not None and not budget.allows(delay):
+            logging.warning(f"论坛 {forum_id} 排序 {sort_type} 需要等待{delay:.1f}秒，超出本轮重试预算，本轮跳过")
+            break
+        # 只阻塞当前组合所在的线程
+        logging.info(f"论坛 {forum_id} 排序 {sort_type} {delay:.1f}秒后重试...")
+        time.sleep(delay)
+    
+    if budget is not None:
+        budget.mark_failed(forum_id)
+    return None
+
+def crawl_segment(forum_id, sort_type, last_id, floor, max_pages, retry_budget=None):
+    """
+    从游标开始沿 last_id 翻页，直到遇到不高于 floor 的帖子、最后一页或页数上限
+    :param last_id: 起始游标，为空时从第一页开始
+    :param floor: 区间下限高水位，为None时（首次抓取）只抓一页
+    :param max_pages: 最多请求的页数
+    :param retry_budget: 本轮轮询的重试预算
+    :return: (帖子列表, 最高排序值, 没抓完时的续抓游标或None, 已请求页数)，第一页抓取失败时帖子列表为None
+    """
+    posts = []
+    top_key = None
+    for pages in range(1, max_pages + 1):
+        page = retry_fetch_page(forum_id, sort_type, last_id, retry_budget)
+        if page is None:
+            # 中途失败时保留已抓到的帖子，从失败的游标开始下一轮续抓
+            return (posts if posts else None), top_key, last_id, pages
+        page_posts, next_id, is_last = page
+        posts.extend(page_posts)
+        keys = [post_sort_key(post, sort_type) for post in page_posts]
+        if None in keys:
+            # 无法判断排序位置时不翻页，也不推进高水位
+            return posts, None, None, pages
+        if keys:
+            top_key = max(keys) if top_key is None else max(top_key, max(keys))
+        if floor is None or is_last or not next_id or not keys or min(keys) <= floor:
+            return posts, top_key, None, pages
+        last_id = next_id
+    return posts, top_key, last_id, max_pages
+
+def crawl_posts(forum_id, sort_type, retry_budget=None):
+    """
+    增量抓取单个 (论坛, 排序方式) 组合
+    先从第一页翻到上次的高水位，只抓两轮之间的增量；页数上限内没抓完的部分记为缺口，
+    之后的轮次用剩余页数从缺口的游标继续向下补抓，已经抓过的页不会重复请求
+    :return: (帖子列表, 本轮最高排序值, 剩余缺口列表)，第一页抓取失败时返回None
+    """
+    key = (forum_id, sort_type)
+    budget = MAX_PAGES
+    posts = []
+    gaps = []
+    top_key = None
+    segments = [('', WATERMARKS.get(key))] + CRAWL_GAPS.get(key, [])
+    for index, (last_id, floor) in enumerate(segments):
+        if budget <= 0:
+            gaps.append((last_id, floor))
+            continue
+        segment_posts, segment_top, next_id, pages = crawl_segment(forum_id, sort_type, last_id, floor, budget, retry_budget)
+        budget -= pages
+        if index == 0:
+            if segment_posts is None:
+                return None
+            top_key = segment_top
+        if segment_posts:
+            posts.extend(segment_posts)
+        if next_id is not None:
+            gaps.append((next_id, floor))
+    return posts, top_key, gaps
+
+def update_watermark(forum_id, sort_type, top_key, gaps):
+    """
+    记录一次增量抓取的结果，在主线程中调用
+    内存中的高水位推进到本轮最高排序值；写入数据库的高水位取缺口中最低的下限，
+    重启后从那里重新抓取，保证缺口中的帖子不会遗漏
+    """
+    key = (forum_id, sort_type)
+    if gaps:
+        CRAWL_GAPS[key] = gaps
+        logging.info(f"论坛 {forum_id} 排序 {sort_type} 本轮未抓完，剩余 {len(gaps)} 个区间下一轮继续补抓")
+    else:
+        CRAWL_GAPS.pop(key, None)
+    if top_key is not None:
+        WATERMARKS[key] = max(top_key, WATERMARKS.get(key, top_key))
+    if key in WATERMARKS:
+        floors = [floor for _, floor in gaps if floor is not None]
+        pending_watermarks[key] = min(floors + [WATERMARKS[key]])
+
+def commit_crawls():
+    """帖子保存完成后推进本轮抓取的高水位"""
+    for updates in pending_crawls.values():
+        for update in updates:
+            update_watermark(*update)
+    pending_crawls.clear()
+
+def discard_crawl(forum_id):
+    """帖子保存失败时丢弃论坛本轮的抓取进度，高水位和缺口保持不变，下一轮重新抓取这些帖子"""
+    pending_crawls.pop(forum_id, None)
+
+def flush_watermarks():
+    """将本轮推进的高水位写入数据库，在帖子保存之后调用"""
+    if pending_watermarks and DB.save_watermarks(pending_watermarks):
+        pending_watermarks.clear()
+
+def poll_forums(forum_list):
+    """
+    并发增量抓取所有 (论坛, 排序方式) 组合，合并结果后再做去重和关键词匹配
+    :param forum_list: 需要抓取的论坛ID列表
+    :return: {论坛ID: 匹配关键词的帖子列表}
+    
+    高水位更新暂存在 pending_crawls 中，由调用方在帖子保存后通过 commit_crawls 生效，
+    保存失败的论坛通过 discard_crawl 丢弃，抓取过程中高水位保持不变
+    """
+    # 本轮所有请求共享重试预算，个别论坛持续失败时不会拖住整轮轮询
+    retry_budget = RetryBudget(RETRY_BUDGET)
+    futures = {
+        POLL_EXECUTOR.submit(crawl_posts, forum_id, sort_type, retry_budget): (forum_id, sort_type)
+        for forum_id in forum_list
+        for sort_type in SORT_TYPES
+    }
+    
+    # 按论坛合并两种排序方式的结果，同一帖子只保留一份
+    merged = {forum_id: {} for forum_id in forum_list}
+    crawled = {forum_id: False for forum_id in forum_list}
+    incomplete = {forum_id: False for forum_id in forum_list}
+    for forum_id in forum_list:
+        pending_crawls[forum_id] = []
+    for future in as_completed(futures):
+        forum_id, sort_type = futures[future]
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.error(f"论坛 {forum_id} 排序 {sort_type} 抓取时发生异常: {e}")
+            continue
+        if result is None:
+            continue
+        posts, top_key, gaps = result
+        crawled[forum_id] = True
+        incomplete[forum_id] = incomplete[forum_id] or bool(gaps)
+        pending_crawls[forum_id].append((forum_id, sort_type, top_key, gaps))
+        for post in posts:
+            merged[forum_id].setdefault(post.post_id, post)
+    
+    # 去重和关键词匹配在主线程中进行，避免并发修改缓存
+    results = {}
+    for forum_id, posts in merged.items():
+        new_posts = take_new_posts(forum_id, list(posts.values()))
+        if crawled[forum_id]:
+            SCHEDULER.record(forum_id, len(new_posts), incomplete[forum_id])
+        else:
+            SCHEDULER.reschedule(forum_id)
+        results[forum_id] = match_posts(new_posts)
+    return results
+
+class PollScheduler:
+    """按论坛活跃度自适应调整轮询间隔的调度器"""
+    
+    def __init__(self, forum_list, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                 initial_interval=POLL_INTERVAL, target_new=PAGE_SIZE // 2, smoothing=0.3):
+        """
+        :param forum_list: 需要调度的论坛ID列表
+        :param min_interval: 最短轮询间隔（秒）
+        :param max_interval: 最长轮询间隔（秒）
+        :param initial_interval: 尚无统计数据时使用的间隔（秒）
+        :param target_new: 期望每次轮询看到的新帖数，间隔按 target_new / 到达速率 计算
+        :param smoothing: 到达速率指数平滑系数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new = target_new
+        self.smoothing = smoothing
+        initial_interval = min(max(initial_interval, min_interval), max_interval)
+        self.intervals = {forum_id: initial_interval for forum_id in forum_list}
+        self.rates = {forum_id: 0.0 for forum_id in forum_list}  # 新帖到达速率（帖/秒）
+        self.last_poll = {}
+        self.failures = {}  # 连续抓取失败的轮数
+        
+        # 优先队列，元素为 (下次轮询时间, 论坛ID)；重新排队时旧元素惰性失效
+        now = time.monotonic()
+        self._next_due = {forum_id: now for forum_id in forum_list}
+        self._queue = [(now, forum_id) for forum_id in forum_list]
+        heapq.heapify(self._queue)
+    
+    def _schedule(self, forum_id, due):
+        """安排论坛的下次轮询时间"""
+        self._next_due[forum_id] = due
+        heapq.heappush(self._queue, (due, forum_id))
+    
+    def seconds_until_due(self, now=None):
+        """距离下一个论坛到期还需等待的秒数"""
+        # 丢弃已失效的队首元素
+        while self._queue and self._next_due.get(self._queue[0][1]) != self._queue[0][0]:
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return self.max_interval
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._queue[0][0] - now)
+    
+    def pop_due(self, now=None):
+        """取出所有已到期的论坛ID"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due_time, forum_id = heapq.heappop(self._queue)
+            if self._next_due.get(forum_id) == due_time:
+                del self._next_due[forum_id]
+                due.append(forum_id)
+        return due
+    
+    def record(self, forum_id, new_count, incomplete, now=None):
+        """
+        记录一次轮询结果并安排该论坛的下次轮询
+        :param new_count: 本次看到的新帖数
+        :param incomplete: 本轮增量抓取是否因页数上限没抓完（需要立即再次轮询继续补抓）
+        """
+        now = time.monotonic() if now is None else now
+        self.failures.pop(forum_id, None)
+        last = self.last_poll.get(forum_id)
+        self.last_poll[forum_id] = now
         
-        # 发送企业微信通知
-        from wechat_notify import notify_new_post
-        notify_new_post(post['post'])
+        # 首次轮询时缓存为空，所有帖子都是"新帖"，不参与速率统计
+        if last is None:
+            self._schedule(forum_id, now + self.intervals[forum_id])
+            return
         
-        post_data = {
-            'post_id': post['post']['post_id'],
-            'forum_id': forum_name,
-            'title': post['post']['subject'],
-            'content': post['post']['content'],
-            'keywords': '、'.join(post['matched_keywords']),
-            'url': f"https://www.miyoushe.com/sr/article/{post['post']['post_id']}",
-            'author': post['post'].get('user', {}).get('nickname', '匿名用户'),
-            'author_id': post['post'].get('user', {}).get('uid', ''),
-            'created_at': post['post']['created_at'],
-            'updated_at': post['post']['updated_at'],
-            'view_count': post['post'].get('view_count', 0),
-            'reply_count': post['post'].get('reply_count', 0),
-            'like_count': post['post'].get('like_count', 0)
-        }
+        elapsed = max(now - last, 1e-3)
+        sample = new_count / elapsed
+        self.rates[forum_id] = self.smoothing * sample + (1 - self.smoothing) * self.rates[forum_id]
         
-        # 先检查帖子是否已存在
-        if DB.post_exists(post_data['post_id']):
-            DB.delete_post(post_data['post_id'])
-            logging.info(f"已删除旧帖子: {post_data['post_id']}")
-            
-            # 发送更新通知
-            from dingtalk_notify import notify_new_post
-            notify_new_post(post['post'], is_update=True)
-            
-            # 发送企业微信更新通知
-            from wechat_notify import notify_new_post
-            notify_new_post(post['post'], is_update=True)
-            
-        DB.save_post(post_data)
+        rate = self.rates[forum_id]
+        interval = self.target_new / rate if rate > 0 else self.max_interval
+        self.intervals[forum_id] = min(max(interval, self.min_interval), self.max_interval)
         
-    logging.info(f"成功保存{len(posts)}条帖子数据到数据库")
-
-# 添加重试次数和间隔时间配置
-MAX_RETRIES = 5  # 最大重试次数
-RETRY_DELAY = 30  # 固定重试延迟（秒）
-
-def retry_get_posts(forum_id, retries=MAX_RETRIES):
-    """使用固定30秒间隔的重试机制获取帖子，区分连接失败和没有匹配关键词的帖子的情况"""
-    all_results = []
+        if incomplete:
+            logging.info(f"论坛 {forum_id} 本轮没抓完，立即再次轮询")
+            self._schedule(forum_id, now)
+        else:
+            self._schedule(forum_id, now + self.intervals[forum_id])
     
-    # 同时获取最新回复和最新发布的帖子
-    for sort_type in [1, 2]:  # 1=最新回复, 2=最新发布
-        for attempt in range(retries):
-            # 获取帖子数据
-            result = get_posts(forum_id, sort_type)
-            
-            # 检查返回结果
-            # 如果result为None，表示连接失败或数据结构异常，需要重试
-            # 如果result是空列表，表示成功获取数据但没有匹配的帖子，不需要重试
-            # 如果result有内容，表示成功获取到匹配的帖子，不需要重试
-            
-            # 如果成功获取到数据（无论是否有匹配的帖子）
-            if result is not None:
-                # 如果有匹配的帖子，添加到结果列表
-                if result:
-                    all_results.extend(result)
-                    logging.info(f"第{attempt+1}次尝试成功获取到 {len(result)} 个匹配关键词的帖子")
-                else:
-                    # 成功获取数据但没有匹配的帖子
-                    logging.info(f"第{attempt+1}次尝试成功获取数据，但没有找到匹配关键词的帖子")
-                
-                # 继续尝试另一种排序方式
-                break
-            
-            # 连接失败或数据结构异常，需要重试
-            # 如果是最后一次尝试，返回所有已收集的结果
-            if attempt == retries - 1:
-                logging.warning(f"已达到最大重试次数 {retries}，返回已收集的 {len(all_results)} 个结果")
-                return all_results
-                
-            # 使用固定的30秒延迟时间
-            logging.warning(f"第{attempt+1}次尝试获取数据失败，{RETRY_DELAY}秒后重试...")
-            time.sleep(RETRY_DELAY)
+    def reschedule(self, forum_id, now=None):
+        """抓取失败时重新排队，不更新统计数据；连续失败时间隔按次数翻倍，不超过最长间隔"""
+        now = time.monotonic() if now is None else now
+        self.failures[forum_id] = self.failures.get(forum_id, 0) + 1
+        delay = min(self.intervals[forum_id] * 2 ** (self.failures[forum_id] - 1), self.max_interval)
+        if self.failures[forum_id] > 1:
+            logging.warning(f"论坛 {forum_id} 连续 {self.failures[forum_id]} 轮抓取失败，{delay:.0f}秒后再试")
+        self._schedule(forum_id, now + delay)
     
-    # 如果所有尝试都失败但收集到了一些结果，仍然返回这些结果
-    if all_results:
-        logging.info(f"成功收集到 {len(all_results)} 个匹配的帖子")
+    def stats(self):
+        """返回每个论坛当前的轮询间隔和新帖到达速率"""
+        return {
+            forum_id: {
+                'interval': round(self.intervals[forum_id], 1),
+                'rate_per_min': round(self.rates[forum_id] * 60, 2),
+            }
+            for forum_id in self.intervals
+        }
     
-    return all_results
+    def log_stats(self):
+        """将调度统计写入日志"""
+        for forum_id, item in self.stats().items():
+            logging.info(f"论坛 {forum_id} 轮询间隔 {item['interval']}秒，新帖速率 {item['rate_per_min']}帖/分钟")
+
+SCHEDULER = PollScheduler(forum_ids)
 
 def main():
+    global DISPATCHER
+    DISPATCHER = create_dispatcher()
     try:
+        warm_seen_index()
+        next_prune = time.monotonic() + SEEN_PRUNE_INTERVAL
+        # 恢复增量抓取的高水位，重启后只抓停机期间的增量
+        WATERMARKS.update(DB.load_watermarks())
+        # 清理一周前已发送的通知记录
+        DB.purge_outbox(time.time() - 7 * 24 * 3600)
         while True:
+            # 等待下一个到期的论坛
+            delay = SCHEDULER.seconds_until_due()
+            if delay > 0:
+                logging.info(f"休眠{delay:.1f}秒后继续检查...")
+                time.sleep(delay)
+            due_forums = SCHEDULER.pop_due()
+            if not due_forums:
+                continue
+            
             current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             logging.info(f"开始检查新帖子...")
             
-            # 首先检查网络连接
-            if not check_internet_connection():
-                logging.warning("网络连接不可用，但仍将尝试获取数据...")
-                # 不再直接跳过，而是继续尝试，因为即使网络不稳定也可能获取到部分数据
+            # 检查关键词配置是否有变化
+            KEYWORDS.check()
+            
+            # 熔断器打开时本轮请求会被直接跳过，冷却结束后由一个探测请求确认是否恢复
+            if BREAKER.state == OPEN:
+                logging.warning(f"API连接异常，请检查您的网络设置，{BREAKER.retry_after():.0f}秒后重新探测")
                 
-            for forum_id in forum_ids:
+            # 并发抓取所有到期的论坛
+            results = poll_forums(due_forums)
+            
+            for forum_id in due_forums:
                 forum_name = "候车室" if forum_id == 52 else "攻略" if forum_id == 61 else f"未知论坛({forum_id})"
                 logging.info(f"正在检查论坛: {forum_name}...")
                 
-                # 使用改进的重试函数获取帖子
-                hitted_post = retry_get_posts(forum_id)
+                hitted_post = results[forum_id]
                 
                 if len(hitted_post) > 0:
                     logging.info(f"发现 {len(hitted_post)} 个匹配关键词的帖子!")
                     content = ""
                     for post in hitted_post:
                         # 提取帖子信息
-                        post_id = post['post']['post_id']
-                        subject = post['post']['subject']
+                        post_id = post.post_id
+                        subject = post.subject
                         # 只在日志中显示摘要，避免日志过大
-                        content_text = post['post']['content']
+                        content_text = post.content
                         if len(content_text) > 100:
                             content_summary = content_text[:100] + "..."
                         else:
@@ -301,14 +692,28 @@ def main():
                     
                     # 为每个帖子添加forum_id信息并保存到数据库
                     for post in hitted_post:
-                        post['forum_id'] = forum_id
-                        post['matched_keywords'] = [kw for kw in keywords if kw in post['post']['subject'] or kw in post['post']['content']]
-                    save_to_database(hitted_post)
+                        post.forum_id = forum_id
+                    if not save_to_database(hitted_post):
+                        # 保存失败时不能记为已见，否则这些帖子再也不会被保存和通知
+                        logging.error(f"论坛 {forum_name} 的匹配帖子保存失败，下一轮重新处理")
+                        release_seen_posts(forum_id)
+                        discard_crawl(forum_id)
                 else:
                     logging.info(f"未发现匹配关键词的新帖子")
             
-            logging.info(f"休眠30秒后继续检查...")
-            time.sleep(30)
+            commit_crawls()
+            flush_seen_posts()
+            if time.monotonic() >= next_prune:
+                prune_seen_posts()
+                next_prune = time.monotonic() + SEEN_PRUNE_INTERVAL
+            flush_watermarks()
+            SCHEDULER.log_stats()
+            DISPATCHER.log_stats()
+            for forum_id in due_forums:
+                seen_stats = cached_post_id[forum_id].stats()
+                logging.info(f"论坛 {forum_id} 已见索引: {seen_stats['size']}条，命中 {seen_stats['hits']}，"
+                             f"未命中 {seen_stats['misses']}，淘汰 {seen_stats['evicted']}，误判 {seen_stats['false_positives']}，"
+                             f"内存约 {seen_stats['memory_bytes'] / 1024:.1f}KB")
     except KeyboardInterrupt:
         logging.info("程序被用户中断，正在退出...")
     except Exception as e:
@@ -317,7 +722,147 @@ def main():
         import traceback
         logging.error(f"异常详情: {traceback.format_exc()}")
         raise
+    finally:
+        # 退出前尽量发送完已到期的通知，其余保留在发件箱中
+        logging.info("正在发送剩余的通知...")
+        DISPATCHER.shutdown()
+
+# 历史回填按发布时间倒序翻页，遇到早于起始日期的帖子即停止
+BACKFILL_SORT_TYPE = 2
+
+def fetch_backfill_page(forum_id, last_id, bucket):
+    """按限流抓取回填的一页，回填没有轮询周期，重试只受最大尝试次数限制"""
+    bucket.acquire()
+    return retry_fetch_page(forum_id, BACKFILL_SORT_TYPE, last_id)
+
+def write_backfill_batch(forum_id, posts, checkpoint):
+    """
+    对一批回填帖子做关键词匹配并批量写入数据库，成功后保存断点
+    :param posts: 本批抓取到的帖子列表
+    :param checkpoint: 写入成功后要保存的断点
+    :return: 是否写入成功
+    """
+    hitted_post = match_posts(posts)
+    for post in hitted_post:
+        post.forum_id = forum_id
+    # 历史帖子不发送通知；全部帖子记为已见，避免监控时再次匹配
+    if not save_to_database(hitted_post, notify=False):
+        return False
+    if not DB.mark_seen(forum_id, [post.post_id for post in posts]):
+        return False
+    checkpoint['matched'] += len(hitted_post)
+    return DB.save_backfill_checkpoint(forum_id, checkpoint)
+
+def backfill(forum_list, since, rate=2.0, workers=4, batch_size=200):
+    """
+    历史回填：按发布时间倒序翻页，把每个论坛起始日期之后的帖子写入数据库
+    
+    同一论坛的下一页依赖上一页返回的游标，因此每个论坛同时只有一个在途请求，多个论坛的请求在线程池中并发进行；
+    下一页的请求在当前批次匹配和写入时就已发出。所有请求共享一个令牌桶限流。
+    每批帖子写入后保存断点，中断后使用相同的起始日期重新运行会从断点继续。
+    :param forum_list: 需要回填的论坛ID列表
+    :param since: 起始日期（YYYY-MM-DD）
+    :param rate: 每秒最多请求数
+    :param workers: 并发请求数上限
+    :param batch_size: 每批匹配和写入的帖子数
+    """
+    since_ts = datetime.datetime.strptime(since, '%Y-%m-%d').timestamp()
+    bucket = TokenBucket(rate, max(1, int(rate)))
+    checkpoints = {}
+    buffers = {}
+    in_flight = {}
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for forum_id in forum_list:
+            checkpoint = DB.load_backfill_checkpoint(forum_id)
+            if checkpoint and checkpoint['since'] == since:
+                if checkpoint['done']:
+                    logging.info(f"论坛 {forum_id} 已回填到 {since}，跳过")
+                    continue
+                logging.info(f"论坛 {forum_id} 从断点继续回填：已抓取 {checkpoint['pages']} 页 {checkpoint['posts']} 个帖子")
+            else:
+                checkpoint = {'since': since, 'last_id': '', 'pages': 0, 'posts': 0, 'matched': 0, 'done': False}
+            checkpoints[forum_id] = checkpoint
+            buffers[forum_id] = {'posts': [], 'pages': 0}
+            future = executor.submit(fetch_backfill_page, forum_id, checkpoint['last_id'], bucket)
+            in_flight[future] = forum_id
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                forum_id = in_flight.pop(future)
+                checkpoint = checkpoints[forum_id]
+                try:
+                    page = future.result()
+                except Exception as e:
+                    logging.error(f"论坛 {forum_id} 回填请求发生异常: {e}")
+                    page = None
+                if page is None:
+                    # 断点停在最后一次成功写入的位置，下次运行从那里继续
+                    logging.error(f"论坛 {forum_id} 回填中断，已保存的断点: 第 {checkpoint['pages']} 页")
+                    continue
+                
+                posts, next_id, is_last = page
+                kept = [post for post in posts if float(post.created_at) >= since_ts]
+                finished = is_last or not next_id or len(kept) < len(posts)
+                if not finished:
+                    # 先发出下一页请求，再匹配和写入当前批次
+                    next_future = executor.submit(fetch_backfill_page, forum_id, next_id, bucket)
+                    in_flight[next_future] = forum_id
+                
+                # 断点只在批次写入成功后推进，未写入的页下次运行会重新抓取
+                buffer = buffers[forum_id]
+                buffer['posts'].extend(kept)
+                buffer['pages'] += 1
+                if not finished and len(buffer['posts']) < batch_size:
+                    continue
+                
+                batch = buffer['posts']
+                buffers[forum_id] = {'posts': [], 'pages': 0}
+                checkpoint.update(last_id=next_id, pages=checkpoint['pages'] + buffer['pages'],
+                                  posts=checkpoint['posts'] + len(batch), done=finished)
+                if not write_backfill_batch(forum_id, batch, checkpoint):
+                    logging.error(f"论坛 {forum_id} 回填写入失败，停止该论坛的回填")
+                    for other, other_forum in list(in_flight.items()):
+                        if other_forum == forum_id:
+                            other.cancel()
+                            del in_flight[other]
+                    continue
+                oldest = min((float(post.created_at) for post in batch), default=None)
+                oldest_text = datetime.datetime.fromtimestamp(oldest).strftime('%Y-%m-%d %H:%M') if oldest else "-"
+                logging.info(f"论坛 {forum_id} 回填进度：{checkpoint['pages']} 页，{checkpoint['posts']} 个帖子，"
+                             f"匹配 {checkpoint['matched']} 个，已到 {oldest_text}")
+                if finished:
+                    logging.info(f"论坛 {forum_id} 回填完成")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def parse_args():
+    """解析命令行参数，不带子命令时启动监控"""
+    parser = argparse.ArgumentParser(description="米游社星穹铁道帖子监控")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('monitor', help="持续监控新帖子（默认）")
+    
+    backfill_parser = subparsers.add_parser('backfill', help="回填论坛的历史帖子")
+    backfill_parser.add_argument('--since', required=True, help="回填的起始日期，格式 YYYY-MM-DD")
+    backfill_parser.add_argument('--forums', default=','.join(str(id) for id in forum_ids),
+                                 help="需要回填的论坛ID，逗号分隔，默认使用配置文件中的论坛")
+    backfill_parser.add_argument('--rate', type=float, default=config.getfloat('backfill', 'rate', fallback=2.0),
+                                 help="每秒最多请求数")
+    backfill_parser.add_argument('--workers', type=int, default=config.getint('backfill', 'workers', fallback=4),
+                                 help="并发请求数上限")
+    backfill_parser.add_argument('--batch-size', type=int, default=config.getint('backfill', 'batch_size', fallback=200),
+                                 help="每批匹配和写入的帖子数")
+    return parser.parse_args()
 
 # 启动主程序
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.command == 'backfill':
+        try:
+            backfill([int(id.strip()) for id in args.forums.split(',')], args.since,
+                     args.rate, args.workers, args.batch_size)
+        except KeyboardInterrupt:
+            logging.info("回填被用户中断，已写入的进度保存在断点中")
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import logging
+import importlib
+
+from notify_dispatcher import Channel
+
+# 通知渠道注册表：渠道名 -> (通知模块, 配置节中必须填写的选项)
+# 通知模块需要提供 notify_new_post(post_data, is_update)、send_markdown(title, text)、
+# MAX_MESSAGE_BYTES 和 RATE_PER_MINUTE，渠道名同时也是 config.ini 中的配置节名
+NOTIFIERS = {
+    'dingtalk': ('dingtalk_notify', 'webhook_url'),
+    'wechat': ('wechat_notify', 'webhook_url'),
+    'file': ('file_notify', 'path'),
+}
+
+# 未配置 [notify] channels 时启用的渠道
+DEFAULT_CHANNELS = 'dingtalk,wechat'
+
+
+def register_notifier(name, module_name, required_option):
+    """
+    注册新的通知渠道（如飞书、邮件）
+    :param name: 渠道名，也是配置节名
+    :param module_name: 通知模块名
+    :param required_option: 配置节中必须填写的选项，为空时不启用该渠道
+    """
+    NOTIFIERS[name] = (module_name, required_option)
+
+
+def configured_channel_names(config):
+    """返回 [notify] channels 中列出且已填写必需配置的渠道名"""
+    names = []
+    for name in config.get('notify', 'channels', fallback=DEFAULT_CHANNELS).split(','):
+        name = name.strip()
+        if not name or name in names:
+            continue
+        if name not in NOTIFIERS:
+            logging.warning(f"未知的通知渠道: {name}")
+            continue
+        required_option = NOTIFIERS[name][1]
+        if not config.get(name, required_option, fallback='').strip():
+            logging.warning(f"通知渠道 {name} 未配置 {required_option}，已跳过")
+            continue
+        names.append(name)
+    return names
+
+
+def load_channels(config):
+    """
+    按配置加载通知渠道，只导入已启用渠道的模块
+    :param config: ConfigParser
+    :return: {渠道名: Channel}
+    """
+    burst = config.getint('notify', 'burst', fallback=5)
+    channels = {}
+    for name in configured_channel_names(config):
+        try:
+            module = importlib.import_module(NOTIFIERS[name][0])
+        except Exception as e:
+            logging.error(f"加载通知渠道 {name} 失败: {e}")
+            continue
+        # 限流参数优先使用渠道配置节，其次是 [notify]，最后按平台限制扣除突发数，
+        # 保证突发加上一分钟的补充不超过平台每分钟的上限
+        rate_per_minute = config.getint('notify', 'rate_per_minute',
+                                        fallback=max(module.RATE_PER_MINUTE - burst, 1))
+        channels[name] = Channel(
+            send=module.notify_new_post,
+            send_markdown=module.send_markdown,
+            max_message_bytes=module.MAX_MESSAGE_BYTES,
+            rate_per_minute=config.getint(name, 'rate_per_minute', fallback=rate_per_minute),
+            burst=config.getint(name, 'burst', fallback=burst),
+        )
+    logging.info(f"已启用通知渠道: {', '.join(channels) or '无'}")
+    return channels
@@ -0,0 +1,99 @@
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class NotifierTransport:
+    """
+    通知模块共享的 HTTP 传输层
+
+    按 webhook 主机各自维护一个 requests.Session，连接保持长连接复用，
+    遇到 429/5xx 时按指数退避自动重试（429 会遵循 Retry-After），并记录每次请求的耗时。
+    """
+
+    def __init__(self, timeout=10, retries=3, backoff_factor=0.5, pool_maxsize=4):
+        """
+        :param timeout: 请求超时时间（秒）
+        :param retries: 429/5xx 时的最大重试次数
+        :param backoff_factor: 重试退避因子
+        :param pool_maxsize: 每个主机的连接池大小
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, url):
+        """获取 URL 所在主机的会话，不存在时创建"""
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                retry_strategy = Retry(
+                    total=self.retries,
+                    backoff_factor=self.backoff_factor,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["POST"],
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount(key, adapter)
+                session.headers.update({'Content-Type': 'application/json'})
+                self._sessions[key] = session
+        return session, parts.netloc
+
+    def post_json(self, url, message):
+        """
+        以 JSON 格式发送消息
+        :return: requests.Response
+        """
+        session, host = self._session_for(url)
+        start = time.perf_counter()
+        status = "异常"
+        try:
+            response = session.post(url, data=json.dumps(message), timeout=self.timeout)
+            status = response.status_code
+            return response
+        finally:
+            logging.info(f"webhook请求 {host} 状态 {status} 耗时 {(time.perf_counter() - start) * 1000:.0f}毫秒")
+
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def check_response(response):
+    """
+    检查机器人 webhook 的响应
+    钉钉和企业微信在限流（钉钉 130101、企业微信 45009）或拒绝消息时同样返回 HTTP 200，
+    只有响应体中的 errcode 为 0 才表示发送成功
+    :param response: requests.Response
+    :return: (是否成功, 失败原因)
+    """
+    if response.status_code != 200:
+        return False, f"HTTP {response.status_code}: {response.text}"
+    try:
+        result = response.json()
+    except ValueError:
+        return False, f"响应无法解析: {response.text}"
+    if not isinstance(result, dict) or result.get('errcode') != 0:
+        return False, response.text
+    return True, ""
+
+
+# 全局实例，钉钉和企业微信通知共用
+TRANSPORT = NotifierTransport()
@@ -0,0 +1,274 @@
+import json
+import time
+import random
+import logging
+import threading
+from collections import namedtuple
+
+from rate_limiter import TokenBucket
+
+# 通知渠道：
+#   send(post_data, is_update) 发送单条通知
+#   send_markdown(title, text) 发送一条 markdown 消息
+#   max_message_bytes          单条 markdown 消息的最大字节数
+#   rate_per_minute / burst    webhook 的限流参数
+Channel = namedtuple('Channel', ['send', 'send_markdown', 'max_message_bytes', 'rate_per_minute', 'burst'])
+
+# 汇总消息中每个帖子的摘要长度
+DIGEST_SUMMARY_LENGTH = 60
+
+
+def format_digest_entry(post_data, is_update):
+    """生成汇总消息中单个帖子的 markdown 条目"""
+    title = post_data.get('title', post_data.get('subject', '无标题'))
+    url = post_data.get('url', f"https://www.miyoushe.com/sr/article/{post_data.get('post_id', '')}")
+    content = post_data.get('content', '') or ''
+    summary = content[:DIGEST_SUMMARY_LENGTH] + "..." if len(content) > DIGEST_SUMMARY_LENGTH else content
+    prefix = "[更新] " if is_update else ""
+    entry = f"- **{prefix}[{title}]({url})**\n"
+    if summary:
+        entry += f"  > {summary}\n"
+    return entry
+
+
+def build_digest(items, max_bytes):
+    """
+    将多条通知合并为 markdown 汇总消息，超过平台长度限制时拆分为多条
+    :param items: [(post_data, is_update), ...]
+    :param max_bytes: 单条消息的最大字节数（UTF-8）
+    :return: [(标题, 正文, 包含的通知下标列表), ...]
+    """
+    # 为标题行和分页标记预留空间
+    budget = max_bytes - 200
+    chunks = [([], [])]
+    size = 0
+    for index, (post_data, is_update) in enumerate(items):
+        entry = format_digest_entry(post_data, is_update)
+        entry_bytes = len(entry.encode('utf-8'))
+        if entry_bytes > budget:
+            entry = entry.encode('utf-8')[:budget].decode('utf-8', errors='ignore') + "\n"
+            entry_bytes = len(entry.encode('utf-8'))
+        if chunks[-1][0] and size + entry_bytes > budget:
+            chunks.append(([], []))
+            size = 0
+        chunks[-1][0].append(entry)
+        chunks[-1][1].append(index)
+        size += entry_bytes
+
+    messages = []
+    for number, (entries, indices) in enumerate(chunks, 1):
+        title = f"新帖子汇总（共{len(items)}条）"
+        if len(chunks) > 1:
+            title += f" {number}/{len(chunks)}"
+        messages.append((title, f"### {title}\n\n" + "".join(entries), indices))
+    return messages
+
+
+class NotificationDispatcher:
+    """
+    基于发件箱的后台通知分发器
+
+    通知随帖子在同一事务中写入数据库的 outbox 表，每个渠道一个工作线程从发件箱取件发送，
+    轮询和数据库写入不会被 webhook 的网络延迟阻塞，进程崩溃或重启后未发送的通知会继续发送（至少一次）。
+    工作线程会收集一个短窗口内的通知：只有一条时单独发送，多条时合并为 markdown 汇总；
+    每个渠道有独立的令牌桶，令牌不足时继续收集通知直到有令牌可用，因此突发时自动转为汇总模式。
+    发送失败的通知按带抖动的指数退避重试，超过最大次数后标记为 dead。
+    """
+
+    def __init__(self, channels, db_factory, batch_window=2.0, max_batch=50, poll_interval=5.0,
+                 max_attempts=10, base_backoff=5.0, max_backoff=1800.0):
+        """
+        :param channels: {渠道名: Channel}
+        :param db_factory: 创建 DBHandler 的函数，每个工作线程使用独立的数据库连接
+        :param batch_window: 收集通知的时间窗口（秒）
+        :param max_batch: 单次汇总的最大通知数
+        :param poll_interval: 没有被唤醒时检查发件箱的间隔（秒）
+        :param max_attempts: 单条通知的最大发送次数
+        :param base_backoff: 第一次重试的等待时间（秒），之后每次翻倍
+        :param max_backoff: 重试等待时间上限（秒）
+        """
+        self.channels = dict(channels)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._db_factory = db_factory
+        self._buckets = {
+            name: TokenBucket(channel.rate_per_minute / 60, channel.burst)
+            for name, channel in self.channels.items()
+        }
+        self._events = {name: threading.Event() for name in self.channels}
+        self._stopping = threading.Event()
+        self._stats = {
+            name: {'pending': 0, 'sent': 0, 'failed': 0, 'dead': 0, 'messages': 0, 'digests': 0,
+                   'total_latency': 0.0, 'max_latency': 0.0}
+            for name in self.channels
+        }
+        self._lock = threading.Lock()
+        self._threads = []
+        for name in self.channels:
+            thread = threading.Thread(target=self._worker, args=(name,), name=f"notify-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def outbox_entries(self, post_data, is_update, version):
+        """
+        生成需要写入发件箱的通知
+        :param post_data: 通知内容（帖子数据）
+        :param is_update: 是否为更新通知
+        :param version: 帖子版本（如 updated_at），与帖子ID组成幂等键，同一版本只通知一次
+        :return: [(幂等键, 渠道, JSON负载), ...]
+        """
+        key = f"{post_data['post_id']}:{version}"
+        payload = json.dumps({'post': post_data, 'is_update': is_update}, ensure_ascii=False)
+        return [(key, name, payload) for name in self.channels]
+
+    def wake(self):
+        """通知工作线程发件箱有新通知"""
+        for event in self._events.values():
+            event.set()
+
+    def _worker(self, name):
+        """渠道工作线程：从发件箱取件并按限流发送"""
+        db = self._db_factory()
+        try:
+            while True:
+                rows = self._collect(name, db)
+                with self._lock:
+                    self._stats[name]['pending'] = db.count_pending_outbox(name)
+                if rows:
+                    self._deliver(name, db, rows)
+                    continue
+                if self._stopping.is_set():
+                    return
+                # 等到被唤醒或最早一条重试到期
+                next_attempt = db.next_outbox_attempt(name)
+                timeout = self.poll_interval
+                if next_attempt is not None:
+                    timeout = min(max(next_attempt - time.time(), 0.0), self.poll_interval)
+                self._events[name].wait(timeout)
+                self._events[name].clear()
+        except Exception as e:
+            logging.error(f"通知渠道 {name} 工作线程异常退出: {e}")
+        finally:
+            db.close()
+
+    def _collect(self, name, db):
+        """从发件箱收集一批通知，窗口内和等待令牌期间到达的通知会并入同一批"""
+        rows = db.fetch_outbox(name, self.max_batch)
+        if not rows or self._stopping.is_set():
+            return rows
+        if len(rows) < self.max_batch:
+            self._stopping.wait(self.batch_window)
+            rows = db.fetch_outbox(name, self.max_batch)
+        bucket = self._buckets[name]
+        while len(rows) < self.max_batch and not self._stopping.is_set():
+            wait = bucket.wait_time()
+            if wait <= 0:
+                break
+            self._stopping.wait(wait)
+            rows = db.fetch_outbox(name, self.max_batch)
+        return rows
+
+    def _deliver(self, name, db, rows):
+        """发送一批通知并更新发件箱状态"""
+        channel = self.channels[name]
+        bucket = self._buckets[name]
+        payloads = [json.loads(row['payload']) for row in rows]
+        items = [(payload['post'], payload['is_update']) for payload in payloads]
+        sent, failed = [], []
+        messages = 0
+        error = ""
+        try:
+            if len(items) == 1:
+                bucket.acquire()
+                messages = 1
+                (sent if channel.send(*items[0]) else failed).extend(rows)
+            else:
+                digest = build_digest(items, channel.max_message_bytes)
+                for title, text, indices in digest:
+                    bucket.acquire()
+                    messages += 1
+                    ok = channel.send_markdown(title, text)
+                    (sent if ok else failed).extend(rows[index] for index in indices)
+                logging.info(f"通知渠道 {name} 以汇总模式发送 {len(items)} 条通知，共 {len(digest)} 条消息")
+            if failed:
+                error = "webhook返回失败"
+        except Exception as e:
+            logging.error(f"通知渠道 {name} 发送时出错: {e}")
+            error = str(e)
+            done = {row['id'] for row in sent}
+            failed = [row for row in rows if row['id'] not in done]
+
+        if sent:
+            db.mark_outbox_sent([row['id'] for row in sent])
+        dead = 0
+        if failed:
+            now = time.time()
+            updates = []
+            for row in failed:
+                attempts = row['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    dead += 1
+                    updates.append((row['id'], now, 'dead'))
+                    logging.warning(f"通知渠道 {name} 的通知 {row['idempotency_key']} 已失败 {attempts} 次，放弃发送")
+                else:
+                    # 带抖动的指数退避，避免多条通知同时重试
+                    delay = min(self.base_backoff * 2 ** (attempts - 1), self.max_backoff)
+                    updates.append((row['id'], now + delay * random.uniform(0.5, 1.0), 'pending'))
+            db.reschedule_outbox(updates, error)
+
+        # 分发延迟从写入发件箱开始计算，包含收集、限流和重试等待时间
+        now = time.time()
+        with self._lock:
+            stats = self._stats[name]
+            stats['sent'] += len(sent)
+            stats['failed'] += len(failed)
+            stats['dead'] += dead
+            stats['messages'] += messages
+            if len(items) > 1:
+                stats['digests'] += 1
+            for row in sent:
+                latency = now - row['enqueued_at']
+                stats['total_latency'] += latency
+                stats['max_latency'] = max(stats['max_latency'], latency)
+
+    def stats(self):
+        """返回每个渠道的待发送数、发送计数、剩余令牌和分发延迟（秒）"""
+        result = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                result[name] = {
+                    'pending': stats['pending'],
+                    'sent': stats['sent'],
+                    'failed': stats['failed'],
+                    'dead': stats['dead'],
+                    'messages': stats['messages'],
+                    'digests': stats['digests'],
+                    'tokens': round(self._buckets[name].available, 1),
+                    'avg_latency': round(stats['total_latency'] / stats['sent'], 3) if stats['sent'] else 0.0,
+                    'max_latency': round(stats['max_latency'], 3),
+                }
+        return result
+
+    def log_stats(self):
+        """将各渠道统计写入日志"""
+        for name, item in self.stats().items():
+            logging.info(f"通知渠道 {name}: 待发送 {item['pending']}，成功 {item['sent']}，失败 {item['failed']}，"
+                         f"放弃 {item['dead']}，消息 {item['messages']}（汇总 {item['digests']}），"
+                         f"剩余令牌 {item['tokens']}，平均延迟 {item['avg_latency']}秒，最大延迟 {item['max_latency']}秒")
+
+    def shutdown(self, timeout=30):
+        """
+        停止分发，先尽量发送完已到期的通知，未发送的通知保留在发件箱中，下次启动后继续发送
+        :param timeout: 等待工作线程退出的最长时间（秒）
+        """
+        self._stopping.set()
+        self.wake()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                logging.warning(f"通知线程 {thread.name} 未能在 {timeout} 秒内退出，剩余通知将在下次启动后发送")
@@ -0,0 +1,108 @@
+import logging
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from db_handler import DBHandler
+
+
+class LoaderSignals(QObject):
+    """
+    后台读取线程发给界面线程的信号
+
+    信号都带有查询的代号（generation），界面只处理当前代号的结果，
+    被新查询取代的旧查询即使还有结果送达也会被丢弃。
+    """
+
+    watermark = pyqtSignal(int, object)  # 代号, 查询第一页前数据库的最近变更序号
+    chunk = pyqtSignal(int, list)      # 代号, 行列表
+    progress = pyqtSignal(int, int)    # 代号, 本页已读取的行数
+    finished = pyqtSignal(int, int)    # 代号, 本页的总行数
+
+
+class PageLoader(QRunnable):
+    """
+    在线程池中读取一页帖子，分块发送给界面线程
+
+    每个任务在自己的线程里打开只读连接（SQLite 连接不能跨线程使用），
+    cancel() 会中断正在执行的查询，使慢查询（如 LIKE 全表扫描）也能立即停止。
+    """
+
+    CHUNK_SIZE = 200
+
+    def __init__(self, signals, generation, db_path, profile, query, convert):
+        """
+        :param signals: LoaderSignals，由界面线程创建
+        :param generation: 查询代号
+        :param db_path: 数据库路径
+        :param profile: 数据库性能配置
+        :param query: 传给 DBHandler.iter_posts 的参数字典
+        :param convert: 把查询结果字典转换为表格行的函数
+        """
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.db_path = db_path
+        self.profile = profile
+        self.query = query
+        self.convert = convert
+        self.cancelled = False
+        self.db = None
+
+    def cancel(self):
+        """取消读取，可以从界面线程调用"""
+        self.cancelled = True
+        db = self.db
+        if db is not None:
+            db.interrupt()
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            self.db = DBHandler(self.db_path, profile=self.profile, read_only=True)
+            if self.cancelled:
+                return
+            # 读取第一页前记录数据库的最近变更序号，之后写入的行由增量刷新读取
+            if self.query.get('offset', 0) == 0:
+                self.signals.watermark.emit(self.generation, self.db.get_latest_write())
+            count = 0
+            for rows in self.db.iter_posts(chunk_size=self.CHUNK_SIZE, **self.query):
+                if self.cancelled:
+                    return
+                rows = [self.convert(row) for row in rows]
+                count += len(rows)
+                self.signals.chunk.emit(self.generation, rows)
+                self.signals.progress.emit(self.generation, count)
+            if not self.cancelled:
+                self.signals.finished.emit(self.generation, count)
+        except Exception as e:
+            logging.error(f"读取帖子失败: {e}")
+            self.signals.finished.emit(self.generation, 0)
+        finally:
+            db, self.db = self.db, None
+            if db is not None:
+                db.close()
+
+
+class TaskSignals(QObject):
+    """后台任务的结果信号"""
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class Task(QRunnable):
+    """在线程池中执行一个函数（导出、导入、读取论坛列表等），结果通过信号返回界面线程"""
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
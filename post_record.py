@@ -0,0 +1,89 @@
+import json
+
+# 安装了 orjson 时使用更快的解码器
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class PostRecord:
+    """
+    帖子列表中单个帖子的精简记录，只保留监控需要的字段
+
+    API 返回的每个帖子包含图片、话题、合集等大量字段，解码后立即投影为本记录，
+    原始字典随即释放。forum_id、keyword_hits 和 matched_keywords 在后续流程中填写。
+    """
+
+    __slots__ = ('post_id', 'subject', 'content', 'nickname', 'uid', 'created_at', 'updated_at',
+                 'reply_time', 'view_count', 'reply_count', 'like_count',
+                 'forum_id', 'keyword_hits', 'matched_keywords')
+
+    def __init__(self, post_id, subject, content, nickname='匿名用户', uid='', created_at=0, updated_at=0,
+                 reply_time='', view_count=0, reply_count=0, like_count=0):
+        self.post_id = post_id
+        self.subject = subject
+        self.content = content
+        self.nickname = nickname
+        self.uid = uid
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.reply_time = reply_time
+        self.view_count = view_count
+        self.reply_count = reply_count
+        self.like_count = like_count
+        self.forum_id = None
+        self.keyword_hits = None
+        self.matched_keywords = None
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        从帖子列表的一项投影出精简记录
+        :param item: API 返回的 list 中的一项，包含 post、user、stat 等字段
+        """
+        post = item['post']
+        # 作者和统计数据在列表项上，旧数据结构中位于 post 内
+        user = item.get('user') or post.get('user') or {}
+        stat = item.get('stat') or {}
+        return cls(
+            post_id=str(post['post_id']),
+            subject=post.get('subject') or '',
+            content=post.get('content') or '',
+            nickname=user.get('nickname', '匿名用户'),
+            uid=str(user.get('uid', '')),
+            created_at=post.get('created_at', 0),
+            updated_at=post.get('updated_at', 0),
+            reply_time=post.get('reply_time') or '',
+            view_count=stat.get('view_num', post.get('view_count', 0)),
+            reply_count=stat.get('reply_num', post.get('reply_count', 0)),
+            like_count=stat.get('like_num', post.get('like_count', 0)),
+        )
+
+    def __repr__(self):
+        return f"PostRecord(post_id={self.post_id!r}, subject={self.subject!r})"
+
+
+def loads(content):
+    """解码 JSON，content 可以是 bytes 或 str"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_post_list(content):
+    """
+    解码帖子列表接口的响应并投影为精简记录
+    :param content: 响应体（bytes 或 str）
+    :return: (PostRecord列表, 下一页游标, 是否最后一页)，缺少必要字段时返回None
+    :raises ValueError: 响应不是合法的 JSON
+    """
+    payload = loads(content)
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if not isinstance(data, dict) or not isinstance(data.get('list'), list):
+        return None
+    records = [
+        PostRecord.from_item(item) for item in data['list']
+        if isinstance(item, dict) and isinstance(item.get('post'), dict) and 'post_id' in item['post']
+    ]
+    return records, str(data.get('last_id') or ''), bool(data.get('is_last', True))
@@ -0,0 +1,178 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QColor
+
+
+class PostTableModel(QAbstractTableModel):
+    """
+    帖子表格模型，数据按列保存
+
+    视图只为可见的单元格调用 data()，不会为每个单元格创建 Qt 对象。
+    数据分页读取：滚动到已读取数据的末尾时视图调用 fetchMore，模型通过 request_page
+    回调请求下一页，读取在后台进行，结果通过 append_rows 和 finish_page 送回模型；
+    没有浏览到的行不会从数据库读出。
+
+    设置了 key_column 和 sort_columns 时，merge_rows 可以把新增或更新的行合并到已读取的数据中，
+    行始终按 sort_columns 降序排列（与数据库查询的顺序一致）。
+    """
+
+    # 每页读取的行数
+    PAGE_SIZE = 1000
+    LINK_COLOR = QColor('#4a9eff')
+
+    def __init__(self, titles, link_column=None, key_column=None, sort_columns=(), parent=None):
+        """
+        :param titles: 列标题列表
+        :param link_column: 链接列的序号，该列用链接颜色显示
+        :param key_column: 唯一标识一行的列的序号，合并数据时用于查找已有的行
+        :param sort_columns: 排序列的序号，行按这些列降序排列
+        """
+        super().__init__(parent)
+        self.titles = list(titles)
+        self.link_column = link_column
+        self.key_column = key_column
+        self.sort_columns = tuple(sort_columns)
+        self._columns = [[] for _ in self.titles]
+        self._keys = set()
+        self._request_page = None
+        self._exhausted = True
+        self._loading = False
+
+    def set_source(self, request_page):
+        """
+        替换数据来源，清空已读取的数据并请求第一页
+        :param request_page: 回调 request_page(offset, limit)，开始在后台读取一页；为None时清空表格
+        """
+        self.beginResetModel()
+        self._columns = [[] for _ in self.titles]
+        self._keys = set()
+        self._request_page = request_page
+        self._exhausted = request_page is None
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    @property
+    def loading(self):
+        """是否有页面正在读取"""
+        return self._loading
+
+    def finish_page(self, count):
+        """
+        一页读取完成
+        :param count: 该页读取到的行数，不足一页说明已经读完
+        """
+        self._loading = False
+        if count < self.PAGE_SIZE:
+            self._exhausted = True
+
+    def append_rows(self, rows):
+        """在表格末尾追加行"""
+        if not rows:
+            return
+        start = len(self._columns[0])
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        for column, values in zip(self._columns, zip(*rows)):
+            column.extend(values)
+        if self.key_column is not None:
+            self._keys.update(self._columns[self.key_column][start:])
+        self.endInsertRows()
+
+    def _sort_key(self, row):
+        return tuple(self._columns[column][row] for column in self.sort_columns)
+
+    def _insert_position(self, sort_key):
+        """按降序查找 sort_key 应插入的位置"""
+        low, high = 0, self.rowCount()
+        while low < high:
+            middle = (low + high) // 2
+            if self._sort_key(middle) > sort_key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def merge_rows(self, rows):
+        """
+        合并新增或更新的行，保持排序；行的移动和插入通过模型信号通知视图，
+        已选中的行会随数据一起移动
+        
+        排在已读取部分之后的新行不插入，留给后续分页读取。
+        :param rows: 行列表
+        :return: 新增的行数
+        """
+        added = 0
+        for values in rows:
+            values = list(values)
+            key = values[self.key_column]
+            sort_key = tuple(values[column] for column in self.sort_columns)
+            if key in self._keys:
+                row = self._columns[self.key_column].index(key)
+                position = self._insert_position(sort_key)
+                if position in (row, row + 1):
+                    # 位置不变，原地更新
+                    for column, value in zip(self._columns, values):
+                        column[row] = value
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.titles) - 1))
+                    continue
+                # position 是移动前的插入位置，移除原行后插入位置相应减一
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), position)
+                target = position if position < row else position - 1
+                for column, value in zip(self._columns, values):
+                    column.pop(row)
+                    column.insert(target, value)
+                self.endMoveRows()
+            else:
+                position = self._insert_position(sort_key)
+                if position == self.rowCount() and not self._exhausted:
+                    continue
+                self.beginInsertRows(QModelIndex(), position, position)
+                for column, value in zip(self._columns, values):
+                    column.insert(position, value)
+                self._keys.add(key)
+                self.endInsertRows()
+                added += 1
+        return added
+
+    def value(self, row, column):
+        """返回第 row 行第 column 列的原始值"""
+        return self._columns[column][row]
+
+    def text(self, row, column):
+        """返回单元格的显示文本"""
+        value = self.value(row, column)
+        return '' if value is None else str(value)
+
+    def sample_texts(self, column, limit=200):
+        """返回某列前 limit 行的文本，用于估算列宽"""
+        return [self.text(row, column) for row in range(min(limit, self.rowCount()))]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns[0])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.titles)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.text(index.row(), index.column())
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() == self.link_column:
+            return self.LINK_COLOR
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.titles[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        self._request_page(self.rowCount(), self.PAGE_SIZE)
@@ -0,0 +1,85 @@
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 响应头
+    :param value: 秒数或 HTTP 日期
+    :return: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """统一的重试策略：带完全抖动的指数退避，服务端给出 Retry-After 时至少等待该时间"""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        """
+        :param max_attempts: 最多尝试次数（包括第一次请求）
+        :param base_delay: 第一次重试的退避上限（秒），之后每次翻倍
+        :param max_delay: 退避上限（秒）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        第 attempt 次失败后的等待时间
+        :param attempt: 已失败的次数，从1开始
+        :param retry_after: 服务端要求的等待秒数
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryBudget:
+    """
+    一轮轮询共享的重试时间预算
+
+    等待时间超出本轮剩余预算的重试会被放弃；同一论坛的某个请求放弃后，
+    该论坛本轮的其他请求也不再重试，留给下一轮。
+    """
+
+    def __init__(self, seconds):
+        """
+        :param seconds: 本轮允许用于重试等待的总时长（秒）
+        """
+        self.deadline = time.monotonic() + seconds
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """本轮剩余的预算（秒）"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def allows(self, delay):
+        """等待 delay 秒后重试是否仍在预算内"""
+        return time.monotonic() + delay <= self.deadline
+
+    def mark_failed(self, key):
+        """记录本轮已放弃的论坛"""
+        with self._lock:
+            self._failed.add(key)
+
+    def has_failed(self, key):
+        """论坛本轮是否已放弃"""
+        with self._lock:
+            return key in self._failed
@@ -0,0 +1,144 @@
+import sys
+import time
+import hashlib
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """基于 bytearray 的布隆过滤器，用于紧凑地记录已淘汰的旧帖子ID"""
+
+    def __init__(self, capacity=100000, num_hashes=4, bits_per_item=10):
+        """
+        :param capacity: 预期容纳的ID数量，超过后整体清空以控制误判率
+        :param num_hashes: 哈希函数个数
+        :param bits_per_item: 每个ID占用的位数
+        """
+        self.capacity = capacity
+        self.num_hashes = num_hashes
+        self.num_bits = capacity * bits_per_item
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        """计算ID对应的位位置（双重哈希）"""
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        """加入一个ID"""
+        if self.count >= self.capacity:
+            self.clear()
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        if not self.count:
+            return False
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def clear(self):
+        """清空过滤器"""
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+
+class SeenIndex:
+    """
+    单个论坛的已见帖子索引
+
+    近期的帖子ID保存在 OrderedDict 中，按最近访问顺序排列，超出容量或超过TTL的ID
+    从头部淘汰并转入布隆过滤器，因此查询和插入都是 O(1)，内存占用有上限。
+    布隆过滤器存在误判，命中后还要通过 confirm 回调（如查询 seen_posts 表）确认，
+    避免把新帖子误判为已见而漏掉匹配和通知。
+    """
+
+    def __init__(self, max_size=5000, ttl=7 * 24 * 3600, bloom_capacity=100000, confirm=None):
+        """
+        :param max_size: 精确索引中最多保存的ID数量
+        :param ttl: ID在精确索引中的存活时间（秒），以最后一次看到的时间为准
+        :param bloom_capacity: 旧ID布隆过滤器的容量，为0时不启用
+        :param confirm: 布隆过滤器命中时调用 confirm(post_id) 确认是否真的见过；
+                        为None时无法排除误判，不启用布隆过滤器
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.confirm = confirm
+        self._entries = OrderedDict()  # post_id -> 最后一次看到的时间
+        self._bloom = BloomFilter(bloom_capacity) if bloom_capacity and confirm else None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.false_positives = 0
+
+    def __contains__(self, post_id):
+        now = time.monotonic()
+        if post_id in self._entries:
+            # 命中时刷新访问时间，仍在列表中出现的帖子不会被淘汰
+            self._entries[post_id] = now
+            self._entries.move_to_end(post_id)
+            self.hits += 1
+            return True
+        if self._bloom is not None and post_id in self._bloom:
+            if self.confirm(post_id):
+                # 旧ID重新出现，放回精确索引
+                self.hits += 1
+                self.add(post_id, now)
+                return True
+            self.false_positives += 1
+        self.misses += 1
+        return False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, post_id, now=None):
+        """记录一个已见过的帖子ID"""
+        now = time.monotonic() if now is None else now
+        self._entries[post_id] = now
+        self._entries.move_to_end(post_id)
+        self._evict(now)
+
+    def discard(self, post_id):
+        """把帖子ID恢复为未见（如帖子保存失败，需要下一轮重新处理）"""
+        self._entries.pop(post_id, None)
+
+    def update(self, post_ids):
+        """批量记录帖子ID，按从旧到新的顺序传入"""
+        now = time.monotonic()
+        for post_id in post_ids:
+            self.add(post_id, now)
+
+    def _evict(self, now):
+        """从头部淘汰超出容量或已过期的ID"""
+        entries = self._entries
+        while entries:
+            post_id, seen_at = next(iter(entries.items()))
+            if len(entries) <= self.max_size and now - seen_at <= self.ttl:
+                break
+            entries.popitem(last=False)
+            self.evicted += 1
+            if self._bloom is not None:
+                self._bloom.add(post_id)
+
+    def memory_usage(self):
+        """估算索引占用的内存（字节）"""
+        size = sys.getsizeof(self._entries)
+        size += sum(sys.getsizeof(post_id) for post_id in self._entries)
+        size += len(self._entries) * sys.getsizeof(0.0)
+        if self._bloom is not None:
+            size += sys.getsizeof(self._bloom.bits)
+        return size
+
+    def stats(self):
+        """返回索引大小、命中/未命中次数和内存占用"""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+            'false_positives': self.false_positives,
+            'memory_bytes': self.memory_usage(),
+        }
@@ -1,14 +1,37 @@
 import sys
 import os
+import tempfile
 import pandas as pd
 import configparser
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableWidget, QTableWidgetItem,
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QTableView,
                              QVBoxLayout, QWidget, QPushButton, QLineEdit, QLabel,
-                             QHBoxLayout, QHeaderView, QComboBox, QFileDialog, QDateEdit, QDialog, QListWidget)
-from PyQt6.QtCore import Qt, QUrl, QDate
-from PyQt6.QtGui import QDesktopServices, QPalette, QColor, QFont, QIcon
+                             QHBoxLayout, QHeaderView, QComboBox, QFileDialog, QDateEdit, QDialog, QListWidget,
+                             QCheckBox)
+from PyQt6.QtCore import Qt, QUrl, QDate, QTimer, QThreadPool
+from PyQt6.QtGui import QDesktopServices, QFont
 from datetime import datetime
-import webbrowser
+from db_handler import DBHandler, CHANGE_SEQ_VERSION
+from post_table_model import PostTableModel
+from post_loader import LoaderSignals, PageLoader, Task
+
+# 表格列：(数据库列名, 显示名称)
+VIEW_COLUMNS = [
+    ('id', '唯一ID'), ('timestamp', '时间戳'), ('forum_id', '分区'), ('post_id', '帖子ID'),
+    ('title', '标题'), ('content', '内容摘要'), ('keywords', '匹配关键词'), ('url', '链接'),
+]
+VIEW_COLUMN_NAMES = [column for column, _ in VIEW_COLUMNS]
+# 旧版本数据中的论坛ID到名称的映射
+FORUM_NAMES = {'52': '候车室', '61': '攻略区'}
+# 链接列序号
+LINK_COLUMN = 7
+# 按内容自适应宽度的列，宽度只根据表头和前若干行估算
+SAMPLED_COLUMNS = (0, 1, 2, 3, 6, 7)
+COLUMN_WIDTH_SAMPLE = 200
+MAX_COLUMN_WIDTH = 360
+# 输入停止多久后才执行查询（毫秒）
+FILTER_DEBOUNCE_MS = 300
+# 一次增量刷新最多读取的行数，超过时重新查询
+REFRESH_LIMIT = 1000
 
 class SRDataViewer(QMainWindow):
     def __init__(self):
@@ -18,14 +41,14 @@ class SRDataViewer(QMainWindow):
             QMainWindow {
                 background-color: #1a1b2e;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #252640;
                 color: #ffffff;
                 border: 1px solid #3d3e5c;
                 gridline-color: #3d3e5c;
                 font-family: "Microsoft YaHei";
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #3d3e5c;
             }
             QHeaderView::section {
@@ -46,7 +69,7 @@ class SRDataViewer(QMainWindow):
             QPushButton:hover {
                 background-color: #4d4e6c;
             }
-            QLineEdit, QComboBox {
+            QLineEdit, QComboBox, QDateEdit {
                 background-color: #252640;
                 color: #ffffff;
                 border: 1px solid #3d3e5c;
@@ -54,7 +77,7 @@ class SRDataViewer(QMainWindow):
                 border-radius: 4px;
                 font-family: "Microsoft YaHei";
             }
-            QLabel {
+            QLabel, QCheckBox, QStatusBar {
                 color: #ffffff;
                 font-family: "Microsoft YaHei";
             }
@@ -81,6 +104,16 @@ class SRDataViewer(QMainWindow):
         self.forum_filter.addItem('全部论坛')
         filter_layout.addWidget(self.forum_filter)
         
+        # 日期范围筛选
+        self.date_filter = QCheckBox('按日期')
+        filter_layout.addWidget(self.date_filter)
+        self.start_date = QDateEdit(QDate.currentDate().addDays(-7))
+        self.end_date = QDateEdit(QDate.currentDate())
+        for date_edit in (self.start_date, self.end_date):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat('yyyy-MM-dd')
+            filter_layout.addWidget(date_edit)
+        
         # 关键词管理按钮
         self.keyword_btn = QPushButton('关键词管理')
         self.keyword_btn.clicked.connect(self.show_keyword_dialog)
@@ -91,120 +124,347 @@ class SRDataViewer(QMainWindow):
         import_btn.clicked.connect(self.import_data)
         filter_layout.addWidget(import_btn)
         
+        # 导出按钮
+        export_btn = QPushButton('导出Excel')
+        export_btn.clicked.connect(self.export_data)
+        filter_layout.addWidget(export_btn)
+        
         # 刷新按钮
         refresh_btn = QPushButton('刷新数据')
         refresh_btn.clicked.connect(self.load_data)
         filter_layout.addWidget(refresh_btn)
         
-        # 创建表格
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(['唯一ID', '时间戳', '分区', '帖子ID', '标题', '内容摘要', '匹配关键词', '链接'])
+        # 创建表格，数据由模型按需提供，视图只渲染可见行
+        # 以唯一ID识别行，按时间戳、唯一ID降序排列，与数据库查询的顺序一致
+        self.model = PostTableModel([title for _, title in VIEW_COLUMNS], link_column=LINK_COLUMN,
+                                    key_column=0, sort_columns=(1, 0))
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         
-        # 设置表格列宽
+        # 设置表格列宽：标题和内容拉伸，其余列按抽样内容设置固定宽度，不逐个测量单元格
         header = self.table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         header.setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
         header.setSectionResizeMode(5, QHeaderView.ResizeMode.Stretch)
-        header.setSectionResizeMode(6, QHeaderView.ResizeMode.ResizeToContents)
-        header.setSectionResizeMode(7, QHeaderView.ResizeMode.ResizeToContents)
         
         # 添加布局
         layout.addLayout(filter_layout)
         layout.addWidget(self.table)
         
-        # 加载数据
-        self.load_data()
+        # 筛选条件变化时重新查询；输入类的变化等停止输入后再查询，避免每次按键都查询
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.filter_data)
+        self.search_input.textChanged.connect(lambda _: self.filter_timer.start())
+        self.start_date.dateChanged.connect(self.on_date_changed)
+        self.end_date.dateChanged.connect(self.on_date_changed)
+        self.forum_filter.currentIndexChanged.connect(self.filter_data)
+        self.date_filter.toggled.connect(self.filter_data)
+        
+        # 以只读方式直接读取监控程序的数据库，与监控程序的写入互不阻塞（WAL模式）
+        self.config = configparser.ConfigParser()
+        self.config.read('config.ini', encoding='utf-8')
+        self.db_profile = self.config['database'] if self.config.has_section('database') else None
+        self.db_path = None
+        self.import_path = None
+        
+        # 数据库读取全部在线程池中进行，每个任务使用自己的连接，界面线程不访问数据库
+        self.thread_pool = QThreadPool.globalInstance()
+        self.tasks = set()
+        self.generation = 0
+        self.loader = None
+        self.loader_signals = LoaderSignals(self)
+        self.loader_signals.watermark.connect(self.on_watermark)
+        self.loader_signals.chunk.connect(self.on_chunk)
+        self.loader_signals.progress.connect(self.on_progress)
+        self.loader_signals.finished.connect(self.on_page_finished)
         
         # 连接单元格点击事件
-        self.table.cellClicked.connect(self.handle_cell_click)
+        self.table.clicked.connect(self.handle_cell_click)
+        
+        # 定时检查监控程序新写入或更新的帖子，只读取上次检查之后变化的行
+        self.watermark = None
+        self.refreshing = False
+        self.page_deferred = False
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_changes)
+        self.refresh_interval = self.config.getint('ui', 'refresh_interval', fallback=5)
+        if self.refresh_interval > 0:
+            self.refresh_timer.start(self.refresh_interval * 1000)
+        
+        # 窗口显示后再开始加载数据
+        QTimer.singleShot(0, self.load_data)
     
-    def load_data(self):
-        # 检查并导出数据库
-        db_path = 'posts.db'
-        excel_dir = 'excel'
-        
-        if os.path.exists(db_path):
+    def use_db(self, db_path=None):
+        """
+        切换要查看的数据库
+        :param db_path: 数据库路径，默认为监控程序的数据库
+        :return: 数据库是否存在
+        """
+        db_path = db_path or self.config.get('database', 'db_path', fallback='posts.db')
+        if not os.path.exists(db_path):
+            print(f'数据库不存在: {db_path}')
+            return False
+        # 切换数据库后删除上次导入时生成的临时数据库
+        if self.import_path and self.import_path != db_path:
+            self.cancel_loading()
             try:
-                import sqlite3
-                from datetime import datetime
-                
-                # 创建excel目录
-                os.makedirs(excel_dir, exist_ok=True)
-                
-                # 连接数据库
-                conn = sqlite3.connect(db_path)
-                df = pd.read_sql('SELECT id, timestamp, forum_id, post_id, title, content, keywords, url FROM posts', conn)
-                conn.close()
-                
-                # 导出Excel
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                excel_path = os.path.join(excel_dir, f'posts_{timestamp}.xlsx')
-                df.to_excel(excel_path, index=False)
-                
-            except Exception as e:
-                print(f'数据库导出失败: {e}')
-        
-        # 获取excel文件夹中最新的文件
-        if not os.path.exists(excel_dir):
-            return
-            
-        excel_files = [f for f in os.listdir(excel_dir) if f.endswith('.xlsx')]
-        if not excel_files:
+                os.remove(self.import_path)
+            except OSError as e:
+                print(f'删除临时数据库失败: {e}')
+            self.import_path = None
+        if db_path != self.db_path and self.refresh_interval > 0:
+            # 切换数据库后重新启用增量刷新，旧版本数据库会在第一次检查时再次关闭
+            self.refresh_timer.start(self.refresh_interval * 1000)
+        self.db_path = db_path
+        return True
+    
+    def open_db(self):
+        """打开当前数据库的只读连接，在后台线程中调用，每个线程使用自己的连接"""
+        return DBHandler(self.db_path, profile=self.db_profile, read_only=True)
+    
+    def run_task(self, func, *args, on_finished=None, on_failed=None, error_message='后台任务失败'):
+        """
+        在线程池中执行 func(*args)，完成后在界面线程调用 on_finished(结果)，失败时调用 on_failed()
+        """
+        task = Task(func, *args)
+        self.tasks.add(task)
+        
+        def finished(result):
+            self.tasks.discard(task)
+            if on_finished is not None:
+                on_finished(result)
+        
+        def failed(error):
+            self.tasks.discard(task)
+            self.statusBar().showMessage(f'{error_message}: {error}')
+            print(f'{error_message}: {error}')
+            if on_failed is not None:
+                on_failed()
+        
+        task.signals.finished.connect(finished)
+        task.signals.failed.connect(failed)
+        self.thread_pool.start(task)
+    
+    def load_data(self):
+        """重新读取论坛列表，并按当前筛选条件查询数据库"""
+        if not self.use_db():
             return
-        
-        latest_file = max(excel_files, key=lambda x: os.path.getmtime(os.path.join(excel_dir, x)))
-        file_path = os.path.join(excel_dir, latest_file)
-        
+        self.filter_data()
+        self.run_task(self.read_forum_ids, self.db_path, on_finished=self.update_forums,
+                      error_message='读取论坛列表失败')
+    
+    def read_forum_ids(self, db_path):
+        """读取论坛列表（后台线程）"""
+        db = DBHandler(db_path, profile=self.db_profile, read_only=True)
         try:
-            # 读取Excel文件
-            self.df = pd.read_excel(file_path)
-            self.filter_data()
-        except Exception as e:
-            print(f'加载数据失败: {e}')
+            return db.get_forum_ids()
+        finally:
+            db.close()
+    
+    def update_forums(self, forum_ids):
+        """更新论坛筛选项，旧版本数据中的论坛ID与论坛名称合并为同一项"""
+        forums = {}
+        for forum_id in forum_ids:
+            forums.setdefault(FORUM_NAMES.get(str(forum_id), str(forum_id)), []).append(forum_id)
+        
+        current = self.forum_filter.currentText()
+        self.forum_filter.blockSignals(True)
+        self.forum_filter.clear()
+        self.forum_filter.addItem('全部论坛')
+        for name in sorted(forums):
+            self.forum_filter.addItem(name, forums[name])
+        self.forum_filter.setCurrentText(current)
+        self.forum_filter.blockSignals(False)
+    
+    def on_date_changed(self):
+        """日期变化时，只有启用了日期筛选才重新查询"""
+        if self.date_filter.isChecked():
+            self.filter_timer.start()
+    
+    def current_filters(self):
+        """根据界面上的筛选条件生成 get_posts 的查询条件"""
+        filters = {}
+        search_text = self.search_input.text().strip()
+        if search_text:
+            filters['search_text'] = search_text
+        forum_ids = self.forum_filter.currentData()
+        if forum_ids:
+            filters['forum_id'] = forum_ids
+        if self.date_filter.isChecked():
+            filters['start_date'] = self.start_date.date().toString('yyyy-MM-dd') + ' 00:00:00'
+            filters['end_date'] = self.end_date.date().toString('yyyy-MM-dd') + ' 23:59:59'
+        return filters
+    
+    @staticmethod
+    def row_values(row):
+        """把查询结果转换为表格的一行，并统一论坛名称"""
+        values = [row[column] for column in VIEW_COLUMN_NAMES]
+        values[2] = FORUM_NAMES.get(str(values[2]), values[2])
+        return values
     
     def filter_data(self):
-        if not hasattr(self, 'df'):
+        """按当前筛选条件重新查询，取消仍在进行的旧查询；表格先读取第一页，滚动时再读取后续页"""
+        self.filter_timer.stop()
+        self.cancel_loading()
+        self.generation += 1
+        self.filters = self.current_filters()
+        self.watermark = None
+        self.page_deferred = False
+        self.model.set_source(self.request_page if self.db_path else None)
+    
+    def cancel_loading(self):
+        """取消正在进行的读取"""
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+    
+    def request_page(self, offset, limit):
+        """模型需要下一页时调用，在线程池中读取；增量刷新进行中时等刷新合并后再读取，保证分页位置正确"""
+        if self.refreshing:
+            self.page_deferred = True
             return
-        
-        # 获取过滤条件
-        search_text = self.search_input.text().lower()
-        forum_filter = self.forum_filter.currentText()
-        
-        # 应用过滤
-        filtered_df = self.df.copy()
-        # 论坛ID到名称的映射
-        forum_map = {'52': '候车室', '61': '攻略'}
-        
-        if forum_filter != '全部论坛':
-            # 将论坛名称转换回ID进行过滤
-            forum_id = next((k for k, v in forum_map.items() if v == forum_filter), forum_filter)
-            filtered_df = filtered_df[filtered_df['分区'] == forum_id]
-            
-            # 将论坛ID转换为名称显示
-            filtered_df['分区'] = filtered_df['分区'].replace(forum_map)
-        
-        if search_text:
-            mask = filtered_df['标题'].str.lower().str.contains(search_text, na=False) |\
-                   filtered_df['内容摘要'].str.lower().str.contains(search_text, na=False) |\
-                   filtered_df['匹配关键词'].str.lower().str.contains(search_text, na=False)
-            filtered_df = filtered_df[mask]
-        
-        # 更新表格
-        self.table.setRowCount(len(filtered_df))
-        for i, row in filtered_df.iterrows():
-            for j, value in enumerate(row):
-                item = QTableWidgetItem(str(value))
-                if j == 7:  # 链接列
-                    item.setForeground(QColor('#4a9eff'))
-                self.table.setItem(i, j, item)
-    
-    def handle_cell_click(self, row, col):
-        if col == 7:  # 链接列
-            url = self.table.item(row, col).text()
+        query = {'filters': self.filters, 'columns': VIEW_COLUMN_NAMES,
+                 'limit': limit, 'offset': offset, 'by_time': True}
+        self.loader = PageLoader(self.loader_signals, self.generation, self.db_path, self.db_profile,
+                                 query, self.row_values)
+        self.thread_pool.start(self.loader)
+        self.statusBar().showMessage('正在加载...')
+    
+    def on_watermark(self, generation, watermark):
+        if generation == self.generation:
+            self.watermark = watermark
+    
+    def on_chunk(self, generation, rows):
+        """收到一块数据，旧查询的结果直接丢弃"""
+        if generation == self.generation:
+            first_rows = self.model.rowCount() == 0
+            self.model.append_rows(rows)
+            if first_rows:
+                self.resize_columns()
+    
+    def on_progress(self, generation, count):
+        if generation == self.generation:
+            self.statusBar().showMessage(f'正在加载... 本页已读取 {count} 行')
+    
+    def on_page_finished(self, generation, count):
+        if generation != self.generation:
+            return
+        self.loader = None
+        self.model.finish_page(count)
+        more = '，滚动到底部加载更多' if self.model.canFetchMore() else ''
+        self.statusBar().showMessage(f'已加载 {self.model.rowCount()} 行{more}')
+    
+    def refresh_changes(self):
+        """定时检查数据库中新增或更新的行；页面读取或上次检查尚未完成时跳过本次检查"""
+        if not self.db_path or self.refreshing or self.model.loading:
+            return
+        self.refreshing = True
+        generation = self.generation
+        self.run_task(self.read_changes, self.db_path, self.filters, self.watermark,
+                      on_finished=lambda result: self.on_changes(generation, result),
+                      on_failed=lambda: self.on_changes(generation, None),
+                      error_message='检查新帖子失败')
+    
+    def read_changes(self, db_path, filters, watermark):
+        """
+        读取 watermark 之后写入的行（后台线程）
+        
+        按变更序号索引读取最近新增或更新的少量行，搜索条件在返回后由界面线程应用，
+        无论表有多大，每次检查只需要几次索引查找。查询期间写入的行可能在下一次检查时
+        再次读到，由模型按唯一ID合并。
+        :param watermark: 上次检查时的最近变更序号，为None时读取全部行
+        :return: (最近变更序号, 变化的行)，数据库结构版本过低、无法增量刷新时返回数据库的结构版本
+        """
+        db = DBHandler(db_path, profile=self.db_profile, read_only=True)
+        try:
+            if db.schema_version < CHANGE_SEQ_VERSION:
+                return db.schema_version
+            # 先记录最近变更序号再查询，查询期间写入的行留给下一次检查
+            latest = db.get_latest_write()
+            if latest is None:
+                # 表为空
+                return None, []
+            query = {key: value for key, value in filters.items() if key != 'search_text'}
+            query['after'] = watermark
+            rows = db.get_posts(query, columns=VIEW_COLUMN_NAMES, limit=REFRESH_LIMIT, by_time=True)
+            return latest, [self.row_values(row) for row in rows]
+        finally:
+            db.close()
+    
+    @staticmethod
+    def matches_search(values, search_text):
+        """与数据库搜索相同，在标题和内容中不区分大小写地查找"""
+        search_text = search_text.lower()
+        return any(search_text in str(values[column] or '').lower() for column in (4, 5))
+    
+    def on_changes(self, generation, result):
+        """把增量刷新读取到的行合并到表格"""
+        self.refreshing = False
+        if isinstance(result, int):
+            # 旧版本数据库没有变更序号，关闭增量刷新，只提示一次
+            self.refresh_timer.stop()
+            print(f'数据库结构版本为 {result}，低于 {CHANGE_SEQ_VERSION}，已关闭自动刷新；'
+                  f'运行一次监控程序完成升级后重新打开查看器即可自动刷新')
+        elif generation == self.generation and result is not None:
+            latest, rows = result
+            if len(rows) >= REFRESH_LIMIT:
+                # 变化太多，直接重新查询
+                self.filter_data()
+                return
+            search_text = self.filters.get('search_text')
+            if search_text:
+                rows = [values for values in rows if self.matches_search(values, search_text)]
+            added = self.model.merge_rows(rows)
+            if latest is not None:
+                self.watermark = latest
+            if added:
+                self.statusBar().showMessage(f'新增 {added} 行，共 {self.model.rowCount()} 行')
+        if self.page_deferred:
+            self.page_deferred = False
+            self.request_page(self.model.rowCount(), self.model.PAGE_SIZE)
+    
+    def resize_columns(self):
+        """按表头和前若干行估算列宽，避免测量全部单元格"""
+        metrics = self.table.fontMetrics()
+        header_metrics = self.table.horizontalHeader().fontMetrics()
+        for column in SAMPLED_COLUMNS:
+            width = header_metrics.horizontalAdvance(self.model.titles[column])
+            for text in self.model.sample_texts(column, COLUMN_WIDTH_SAMPLE):
+                width = max(width, metrics.horizontalAdvance(text))
+            self.table.setColumnWidth(column, min(width + 24, MAX_COLUMN_WIDTH))
+    
+    def export_data(self):
+        """将当前筛选条件下的全部数据导出为Excel文件（后台线程）"""
+        if not self.db_path:
+            return
+        os.makedirs('excel', exist_ok=True)
+        default_path = os.path.join('excel', f"posts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出Excel文件", default_path, "Excel Files (*.xlsx)")
+        if file_path:
+            self.statusBar().showMessage('正在导出...')
+            self.run_task(self.write_excel, self.db_path, self.current_filters(), file_path,
+                          on_finished=lambda count: self.statusBar().showMessage(f'已导出 {count} 行到 {file_path}'),
+                          error_message='导出数据失败')
+    
+    def write_excel(self, db_path, filters, file_path):
+        """查询数据并写入Excel文件（后台线程）"""
+        db = DBHandler(db_path, profile=self.db_profile, read_only=True)
+        try:
+            rows = db.get_posts(filters, columns=VIEW_COLUMN_NAMES, by_time=True)
+        finally:
+            db.close()
+        df = pd.DataFrame.from_records([self.row_values(row) for row in rows],
+                                       columns=[title for _, title in VIEW_COLUMNS])
+        df.to_excel(file_path, index=False)
+        return len(df)
+    
+    def handle_cell_click(self, index):
+        if index.column() == LINK_COLUMN:
+            url = self.model.text(index.row(), index.column())
             QDesktopServices.openUrl(QUrl(url))
             
     def show_keyword_dialog(self):
@@ -279,8 +539,11 @@ class SRDataViewer(QMainWindow):
         config.read('config.ini', encoding='utf-8')
         config['keywords']['keywords'] = ','.join(keywords)
         
-        with open('config.ini', 'w', encoding='utf-8') as f:
+        # 先写临时文件再原子替换，监控程序不会读到写了一半的配置
+        tmp_path = 'config.ini.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             config.write(f)
+        os.replace(tmp_path, 'config.ini')
         
         dialog.close()
         
@@ -294,12 +557,38 @@ class SRDataViewer(QMainWindow):
         )
         
         if file_path:
-            try:
-                # 读取Excel文件
-                self.df = pd.read_excel(file_path)
-                self.filter_data()
-            except Exception as e:
-                print(f'导入数据失败: {e}')
+            self.statusBar().showMessage('正在导入...')
+            self.run_task(self.read_excel, file_path, on_finished=self.on_imported, error_message='导入数据失败')
+    
+    @staticmethod
+    def read_excel(file_path):
+        """读取Excel文件并写入临时数据库（后台线程），导入的数据与数据库数据使用相同的查询和筛选"""
+        df = pd.read_excel(file_path).rename(columns={title: column for column, title in VIEW_COLUMNS})
+        df = df[[column for column in VIEW_COLUMN_NAMES if column in df.columns]]
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        db = DBHandler(db_path)
+        try:
+            df.to_sql('posts', db.conn, if_exists='append', index=False)
+        finally:
+            db.close()
+        return db_path
+    
+    def on_imported(self, db_path):
+        """导入完成后切换到临时数据库"""
+        if self.use_db(db_path):
+            self.import_path = db_path
+            self.filter_data()
+            self.run_task(self.read_forum_ids, db_path, on_finished=self.update_forums,
+                          error_message='读取论坛列表失败')
+    
+    def closeEvent(self, event):
+        """关闭窗口时取消读取并删除导入生成的临时数据库"""
+        self.cancel_loading()
+        self.thread_pool.waitForDone(1000)
+        if self.import_path and os.path.exists(self.import_path):
+            os.remove(self.import_path)
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
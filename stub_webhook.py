@@ -0,0 +1,90 @@
+"""
+本地 webhook 桩服务，用于在不访问钉钉/企业微信的情况下测试和压测通知发送
+
+用法:
+    python stub_webhook.py [--port 8765] [--delay 0.01] [--handshake-delay 0.03] [--fail-every 0]
+然后把 config.ini 中的 webhook_url 指向 http://127.0.0.1:8765/robot/send?access_token=test
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    """模拟机器人接口：读取请求体并返回 errcode=0，支持长连接"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写出，关闭 Nagle 算法避免长连接下的延迟确认等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # 模拟每个新连接的建立开销（TCP+TLS 握手），长连接复用时只发生一次
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        with server.lock:
+            server.request_count += 1
+            count = server.request_count
+        if server.delay:
+            time.sleep(server.delay)
+
+        # 按设定频率返回限流错误；与钉钉一致，限流时仍返回 HTTP 200，错误码在响应体中
+        if server.fail_every and count % server.fail_every == 0:
+            with server.lock:
+                server.throttled_count += 1
+            body = json.dumps({"errcode": 130101, "errmsg": "send too fast, exceed 20 times per minute"}).encode('utf-8')
+        else:
+            body = json.dumps({"errcode": 0, "errmsg": "ok"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 压测时不输出每个请求的访问日志
+        pass
+
+
+def start_stub_webhook(port=0, delay=0.0, fail_every=0, handshake_delay=0.0):
+    """
+    在后台线程中启动桩服务
+    :param port: 监听端口，为0时随机分配
+    :param delay: 每个请求的模拟处理耗时（秒）
+    :param handshake_delay: 每个新连接的模拟握手耗时（秒）
+    :param fail_every: 每隔多少个请求返回一次限流错误（errcode 130101），为0时不返回
+    :return: (server, webhook_url)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubWebhookHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.throttled_count = 0
+    server.delay = delay
+    server.fail_every = fail_every
+    server.handshake_delay = handshake_delay
+    threading.Thread(target=server.serve_forever, name="stub-webhook", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/robot/send?access_token=test"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 webhook 桩服务")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--delay', type=float, default=0.0, help="每个请求的模拟处理耗时（秒）")
+    parser.add_argument('--handshake-delay', type=float, default=0.0, help="每个新连接的模拟握手耗时（秒）")
+    parser.add_argument('--fail-every', type=int, default=0, help="每隔多少个请求返回一次限流错误（errcode 130101）")
+    args = parser.parse_args()
+    server, url = start_stub_webhook(args.port, args.delay, args.fail_every, args.handshake_delay)
+    print(f"webhook桩服务已启动: {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,209 @@
+"""
+增量抓取的回放测试
+
+tests/fixtures 中保存了录制的帖子列表接口响应（按 last_id 游标索引），
+用假的 session.get 回放这些页面，检查高水位、页数上限和缺口续抓的行为。
+"""
+import configparser
+import json
+import os
+import sys
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope='module')
+def monitor(tmp_path_factory):
+    """在临时目录中导入监控模块，数据库和日志文件都写在临时目录"""
+    workdir = tmp_path_factory.mktemp('monitor')
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(ROOT / 'config.ini', encoding='utf-8')
+    config['database']['db_path'] = str(workdir / 'posts.db')
+    with open(workdir / 'config.ini', 'w', encoding='utf-8') as f:
+        config.write(f)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import mysshijian
+    finally:
+        os.chdir(cwd)
+    return mysshijian
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+        self.text = self.content.decode('utf-8')
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class ReplayApi:
+    """按请求中的 sort_type 和 last_id 回放录制的页面，可以指定某些游标返回 500"""
+
+    def __init__(self, name):
+        with open(FIXTURES / name, encoding='utf-8') as f:
+            recording = json.load(f)
+        self.forum_id = recording['forum_id']
+        self.sort_type = recording['sort_type']
+        self.pages = recording['pages']
+        self.failing = set()
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        query = parse_qs(urlparse(url).query)
+        last_id = query.get('last_id', [''])[0]
+        assert int(query['forum_id'][0]) == self.forum_id
+        assert int(query['sort_type'][0]) == self.sort_type
+        self.requests.append(last_id)
+        if last_id in self.failing:
+            return FakeResponse(500)
+        return FakeResponse(200, self.pages[last_id])
+
+    def cursors(self):
+        """按顺序返回所有页面的游标"""
+        return list(self.pages)
+
+    def created_at(self, page, index):
+        """第 page 页（从0开始）第 index 个帖子的发布时间"""
+        return self.pages[self.cursors()[page]]['data']['list'][index]['post']['created_at']
+
+
+@pytest.fixture
+def api(monitor, monkeypatch):
+    from circuit_breaker import CircuitBreaker
+    from retry_policy import RetryPolicy
+    api = ReplayApi('forum_52_sort_2.json')
+    monkeypatch.setattr(monitor.session, 'get', api.get)
+    # 失败的页不重试，熔断器不会在测试之间累计失败
+    monkeypatch.setattr(monitor, 'RETRY_POLICY', RetryPolicy(max_attempts=1))
+    monkeypatch.setattr(monitor, 'BREAKER', CircuitBreaker(failure_threshold=100, cooldown=60))
+    monkeypatch.setattr(monitor, 'SORT_TYPES', (api.sort_type,))
+    monkeypatch.setattr(monitor, 'MAX_PAGES', 10)
+    for state in (monitor.WATERMARKS, monitor.CRAWL_GAPS, monitor.pending_watermarks, monitor.pending_crawls):
+        state.clear()
+    yield api
+    for state in (monitor.WATERMARKS, monitor.CRAWL_GAPS, monitor.pending_watermarks, monitor.pending_crawls):
+        state.clear()
+
+
+def post_ids(posts):
+    return [post.post_id for post in posts]
+
+
+def test_first_crawl_reads_one_page(monitor, api):
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    assert api.requests == ['']
+    assert len(posts) == 3
+    assert top_key == api.created_at(0, 0)
+    assert gaps == []
+
+
+def test_stops_at_watermark(monitor, api):
+    key = (api.forum_id, api.sort_type)
+    monitor.WATERMARKS[key] = api.created_at(1, 1)
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    # 第二页含有不高于高水位的帖子，不再继续翻页
+    assert api.requests == api.cursors()[:2]
+    assert len(posts) == 6
+    assert top_key == api.created_at(0, 0)
+    assert gaps == []
+
+
+def test_max_pages_leaves_gap_for_next_round(monitor, api, monkeypatch):
+    monkeypatch.setattr(monitor, 'MAX_PAGES', 2)
+    key = (api.forum_id, api.sort_type)
+    floor = api.created_at(4, 2) - 1
+    monitor.WATERMARKS[key] = floor
+    cursors = api.cursors()
+
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    assert api.requests == cursors[:2]
+    assert len(posts) == 6
+    assert gaps == [(cursors[2], floor)]
+
+    monitor.update_watermark(api.forum_id, api.sort_type, top_key, gaps)
+    assert monitor.WATERMARKS[key] == api.created_at(0, 0)
+    # 写入数据库的高水位停在缺口下限，重启后会重新抓取缺口
+    assert monitor.pending_watermarks[key] == floor
+
+    # 下一轮第一页就遇到新的高水位，剩余页数用于从缺口继续向下补抓
+    api.requests.clear()
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    assert api.requests == ['', cursors[2]]
+    assert gaps == [(cursors[3], floor)]
+
+
+def test_failed_page_resumes_from_gap(monitor, api):
+    key = (api.forum_id, api.sort_type)
+    floor = api.created_at(4, 2) - 1
+    monitor.WATERMARKS[key] = floor
+    cursors = api.cursors()
+    api.failing.add(cursors[2])
+
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    assert api.requests == cursors[:3]
+    assert len(posts) == 6
+    # 从失败的游标开始续抓，已抓到的页不会重复请求
+    assert gaps == [(cursors[2], floor)]
+    monitor.update_watermark(api.forum_id, api.sort_type, top_key, gaps)
+
+    api.failing.clear()
+    api.requests.clear()
+    posts, top_key, gaps = monitor.crawl_posts(api.forum_id, api.sort_type)
+    assert api.requests == ['', cursors[2], cursors[3], cursors[4]]
+    assert post_ids(posts)[3:] == [item['post']['post_id']
+                                   for cursor in cursors[2:] for item in api.pages[cursor]['data']['list']]
+    assert gaps == []
+
+
+def test_failed_first_page_keeps_watermark(monitor, api):
+    key = (api.forum_id, api.sort_type)
+    monitor.WATERMARKS[key] = api.created_at(2, 0)
+    api.failing.add('')
+
+    assert monitor.crawl_posts(api.forum_id, api.sort_type) is None
+    monitor.poll_forums([api.forum_id])
+    monitor.commit_crawls()
+    assert monitor.WATERMARKS[key] == api.created_at(2, 0)
+    assert monitor.pending_watermarks == {}
+
+
+def test_failed_save_keeps_watermark(monitor, api):
+    forum_id = api.forum_id
+    assert forum_id in monitor.forum_ids
+    key = (forum_id, api.sort_type)
+    floor = api.created_at(1, 2)
+    monitor.WATERMARKS[key] = floor
+    seen = monitor.cached_post_id[forum_id]
+
+    monitor.poll_forums([forum_id])
+    new_ids = list(monitor.pending_seen[forum_id])
+    assert len(new_ids) == 6
+    # 模拟保存失败：丢弃本轮进度，高水位不动，帖子恢复为未见
+    monitor.release_seen_posts(forum_id)
+    monitor.discard_crawl(forum_id)
+    monitor.commit_crawls()
+    assert monitor.WATERMARKS[key] == floor
+    assert monitor.pending_watermarks == {}
+    assert not any(post_id in seen for post_id in new_ids)
+
+    # 下一轮重新抓到同样的帖子，保存成功后高水位才推进
+    api.requests.clear()
+    monitor.poll_forums([forum_id])
+    assert api.requests == api.cursors()[:2]
+    assert sorted(monitor.pending_seen[forum_id]) == sorted(new_ids)
+    monitor.commit_crawls()
+    assert monitor.WATERMARKS[key] == api.created_at(0, 0)
+    assert monitor.pending_watermarks[key] == api.created_at(0, 0)
+    # 不影响其他测试的已见索引
+    monitor.release_seen_posts(forum_id)
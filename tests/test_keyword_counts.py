@@ -0,0 +1,38 @@
+"""关键词统计按帖子发布时间分段，论坛参数可以是ID或名称"""
+import datetime
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_handler import DBHandler
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DBHandler(str(tmp_path / 'posts.db'))
+    created_at = int(datetime.datetime(2024, 1, 1, 12).timestamp())
+    post = {'post_id': '1', 'forum_id': '候车室', 'title': '求助', 'content': '配队', 'keywords': '求助、配队',
+            'url': 'https://www.miyoushe.com/sr/article/1', 'created_at': created_at, 'updated_at': created_at}
+    assert db.save_posts_bulk([post])
+    # 帖子更新后重新保存，保存时间变为现在，发布时间不变
+    assert db.save_posts_bulk([dict(post, updated_at=created_at + 60)])
+    yield db
+    db.close()
+
+
+def keywords(rows):
+    return sorted(row['keyword'] for row in rows)
+
+
+def test_window_uses_created_at(db):
+    assert keywords(db.get_keyword_counts(start_date='2024-01-01', end_date='2024-01-01 23:59:59')) == ['求助', '配队']
+    assert db.get_keyword_counts(start_date=datetime.date.today().isoformat()) == []
+
+
+def test_forum_id_or_name(db):
+    assert keywords(db.get_keyword_counts(forum_id=52)) == ['求助', '配队']
+    assert keywords(db.get_keyword_counts(forum_id='候车室')) == ['求助', '配队']
+    assert db.get_keyword_counts(forum_id=61) == []
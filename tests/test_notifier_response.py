@@ -0,0 +1,102 @@
+"""机器人 webhook 响应检查：只有 errcode 为 0 才算发送成功"""
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db_handler import DBHandler
+from notifier_transport import NotifierTransport, check_response
+from notify_dispatcher import Channel, NotificationDispatcher
+from stub_webhook import start_stub_webhook
+
+
+class FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def test_errcode_zero_is_success():
+    assert check_response(FakeResponse(200, '{"errcode":0,"errmsg":"ok"}')) == (True, "")
+
+
+@pytest.mark.parametrize('body', [
+    '{"errcode":130101,"errmsg":"send too fast, exceed 20 times per minute"}',  # 钉钉限流
+    '{"errcode":45009,"errmsg":"api freq out of limit"}',                      # 企业微信限流
+    '{"errcode":310000,"errmsg":"sign not match"}',
+    '{"errmsg":"ok"}',
+    'not json',
+])
+def test_http_200_with_error_body_fails(body):
+    ok, error = check_response(FakeResponse(200, body))
+    assert not ok
+    assert error
+
+
+def test_http_error_fails():
+    ok, error = check_response(FakeResponse(502, 'Bad Gateway'))
+    assert not ok
+    assert '502' in error
+
+
+def outbox_row(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT status, attempts FROM outbox').fetchone()
+    finally:
+        conn.close()
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_throttled_send_is_retried_from_outbox(tmp_path):
+    """桩服务按平台的方式限流（HTTP 200 + errcode 130101），通知留在发件箱中重试，恢复后发送成功"""
+    server, url = start_stub_webhook(fail_every=1)
+    transport = NotifierTransport(retries=0)
+
+    def send(post_data, is_update):
+        message = {"msgtype": "text", "text": {"content": post_data['title']}}
+        return check_response(transport.post_json(url, message))[0]
+
+    db_path = str(tmp_path / 'posts.db')
+    db = DBHandler(db_path)
+    post = {'post_id': '1', 'forum_id': '候车室', 'title': '求助配队', 'content': '打不过', 'keywords': '求助',
+            'url': 'https://www.miyoushe.com/sr/article/1', 'author': '开拓者', 'author_id': '1',
+            'created_at': 1717000000, 'updated_at': 1717000000, 'view_count': 0, 'reply_count': 0, 'like_count': 0}
+    payload = json.dumps({'post': post, 'is_update': False}, ensure_ascii=False)
+    assert db.save_posts_bulk([post], outbox=[('1:1717000000', 'stub', payload)])
+    db.close()
+
+    dispatcher = NotificationDispatcher(
+        {'stub': Channel(send, lambda title, text: False, 20000, 6000, 10)},
+        db_factory=lambda: DBHandler(db_path), batch_window=0, poll_interval=0.1,
+        base_backoff=0.2, max_backoff=0.2,
+    )
+    try:
+        dispatcher.wake()
+        # 被限流的通知没有标记为已发送，而是记一次失败后等待重试
+        assert wait_for(lambda: outbox_row(db_path)[1] >= 1)
+        assert outbox_row(db_path)[0] == 'pending'
+        assert server.throttled_count >= 1
+
+        server.fail_every = 0
+        assert wait_for(lambda: outbox_row(db_path)[0] == 'sent')
+    finally:
+        dispatcher.shutdown(timeout=5)
+        transport.close()
+        server.shutdown()
@@ -1,8 +1,7 @@
-import requests
-import json
 import logging
 from configparser import ConfigParser
 from datetime import datetime
+from notifier_transport import TRANSPORT, check_response
 
 class WeChatNotifier:
     def __init__(self):
@@ -21,42 +20,64 @@ class WeChatNotifier:
             ]
         )
     
-    def send_notification(self, title, content, post_url):
-        """发送企业微信通知"""
+    def _post(self, message, title):
+        """发送一条消息"""
         try:
-            message = {
-                "msgtype": "text",
-                "text": {
-                    "content": f"{title}\n\n{content}\n\n查看详情: {post_url}\n\n推送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                }
-            }
+            # 通过共享传输层发送，复用长连接并在 429/5xx 时自动重试
+            response = TRANSPORT.post_json(self.webhook_url, message)
             
-            headers = {'Content-Type': 'application/json'}
-            response = requests.post(
-                self.webhook_url,
-                headers=headers,
-                data=json.dumps(message),
-                timeout=10
-            )
-            
-            if response.status_code == 200:
+            # 限流和被拒绝的消息同样返回 HTTP 200，需要检查响应中的 errcode
+            ok, error = check_response(response)
+            if ok:
                 logging.info(f"成功发送企业微信通知: {title}")
                 return True
             else:
-                logging.error(f"发送企业微信通知失败: {response.text}")
+                logging.error(f"发送企业微信通知失败: {error}")
                 return False
         except Exception as e:
             logging.error(f"发送企业微信通知时出错: {e}")
             return False
+    
+    def send_notification(self, title, content, post_url):
+        """发送企业微信通知"""
+        message = {
+            "msgtype": "text",
+            "text": {
+                "content": f"{title}\n\n{content}\n\n查看详情: {post_url}\n\n推送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            }
+        }
+        return self._post(message, title)
+    
+    def send_markdown(self, title, text):
+        """发送企业微信 markdown 消息"""
+        message = {
+            "msgtype": "markdown",
+            "markdown": {
+                "content": text
+            }
+        }
+        return self._post(message, title)
 
 # 全局实例
 NOTIFIER = WeChatNotifier()
 
-def notify_new_post(post_data):
-    """推送新帖子通知"""
+# 企业微信机器人限制：markdown 内容不超过4096字节，每分钟最多20条
+MAX_MESSAGE_BYTES = 4096
+RATE_PER_MINUTE = 20
+
+def notify_new_post(post_data, is_update=False):
+    """推送新帖子通知
+    :param post_data: 帖子数据
+    :param is_update: 是否为更新通知
+    """
     # 兼容不同数据结构格式
-    title = f"新帖子: {post_data.get('title', post_data.get('subject', '无标题'))}"
+    prefix = "[更新] " if is_update else ""
+    title = f"{prefix}新帖子: {post_data.get('title', post_data.get('subject', '无标题'))}"
     content = post_data.get('content', '无内容')
     content = content[:100] + "..." if len(content) > 100 else content
     url = post_data.get('url', f"https://www.miyoushe.com/sr/article/{post_data.get('post_id', '')}")
-    return NOTIFIER.send_notification(title, content, url)
\ No newline at end of file
+    return NOTIFIER.send_notification(title, content, url)
+
+def send_markdown(title, text):
+    """发送 markdown 消息（用于汇总通知）"""
+    return NOTIFIER.send_markdown(title, text)